@@ -0,0 +1,218 @@
+"""
+Admission control and load shedding for Vision Mate.
+Per-session and per-IP frame-rate caps (token buckets), a per-engine limit on
+in-flight inference, and a shared in-flight budget that lower-priority work
+(object detection, enrollment, training, relay writes) may only partly use,
+so face recognition keeps its latency under overload. Work that finds no free
+slot may wait briefly in a bounded queue before it is shed.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from threading import Condition, Lock
+from typing import Dict, Optional, Tuple
+
+
+# Lower number = higher priority
+PRIORITIES = {"face": 0, "object": 1, "enroll": 2, "train": 3, "relay": 4}
+
+
+class Shed(Exception):
+    """Raised when a request is not admitted."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float) -> None:
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, up to `burst` saved."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def try_acquire(self, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Take one token; returns (ok, seconds until a token is available)"""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True, 0.0
+        return False, (1.0 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+@dataclass
+class AdmissionConfig:
+    session_fps: float = 15.0
+    session_burst: float = 30.0
+    ip_fps: float = 40.0
+    ip_burst: float = 80.0
+    # Hard cap per engine (YOLO predict is not thread-safe, so 1)
+    engine_inflight: Dict[str, int] = field(default_factory=lambda: {
+        "face": 4, "object": 1, "enroll": 2, "train": 1, "relay": 16,
+    })
+    # Shared budget; each class may only admit while total in-flight is below its share
+    global_inflight: int = 8
+    priority_share: Dict[str, float] = field(default_factory=lambda: {
+        "face": 1.0, "object": 0.75, "enroll": 0.5, "train": 0.5, "relay": 0.5,
+    })
+    # Bounded wait for a slot before shedding: concurrent clients queue briefly
+    # instead of getting 503 for ordinary contention. Waiters hold a thread.
+    queue_timeout: Dict[str, float] = field(default_factory=lambda: {
+        "face": 0.5, "object": 2.0, "enroll": 5.0, "train": 30.0, "relay": 0.0,
+    })
+    queue_depth: Dict[str, int] = field(default_factory=lambda: {
+        "face": 8, "object": 4, "enroll": 4, "train": 2, "relay": 0,
+    })
+    retry_after_seconds: float = 1.0
+    bucket_idle_seconds: float = 60.0
+
+    @classmethod
+    def from_env(cls) -> "AdmissionConfig":
+        config = cls()
+        config.session_fps = float(os.getenv("VISIONMATE_SESSION_FPS", config.session_fps))
+        config.session_burst = float(os.getenv("VISIONMATE_SESSION_BURST", config.session_burst))
+        config.ip_fps = float(os.getenv("VISIONMATE_IP_FPS", config.ip_fps))
+        config.ip_burst = float(os.getenv("VISIONMATE_IP_BURST", config.ip_burst))
+        config.global_inflight = int(os.getenv("VISIONMATE_MAX_INFLIGHT", config.global_inflight))
+        for engine in PRIORITIES:
+            env_key = f"VISIONMATE_{engine.upper()}_INFLIGHT"
+            config.engine_inflight[engine] = int(os.getenv(env_key, config.engine_inflight[engine]))
+            env_key = f"VISIONMATE_{engine.upper()}_QUEUE_SECONDS"
+            config.queue_timeout[engine] = float(os.getenv(env_key, config.queue_timeout[engine]))
+            env_key = f"VISIONMATE_{engine.upper()}_QUEUE_DEPTH"
+            config.queue_depth[engine] = int(os.getenv(env_key, config.queue_depth[engine]))
+        return config
+
+
+class AdmissionController:
+    """Decides whether a frame/request is admitted or shed, and counts both."""
+
+    def __init__(self, config: Optional[AdmissionConfig] = None) -> None:
+        self.config = config or AdmissionConfig()
+        self._lock = Lock()
+        self._slot_freed = Condition(self._lock)
+        self._session_buckets: Dict[str, TokenBucket] = {}
+        self._ip_buckets: Dict[str, TokenBucket] = {}
+        self._inflight: Dict[str, int] = {engine: 0 for engine in PRIORITIES}
+        self._waiting: Dict[str, int] = {engine: 0 for engine in PRIORITIES}
+        self._admitted: Dict[str, int] = {engine: 0 for engine in PRIORITIES}
+        self._shed: Dict[str, Dict[str, int]] = {
+            engine: {"rate_limited": 0, "overloaded": 0} for engine in PRIORITIES
+        }
+        self._last_prune = time.monotonic()
+
+    def _bucket(self, buckets: Dict[str, TokenBucket], key: str, rate: float, burst: float) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    def _prune_buckets(self, now: float) -> None:
+        if now - self._last_prune < self.config.bucket_idle_seconds:
+            return
+        self._last_prune = now
+        for buckets in (self._session_buckets, self._ip_buckets):
+            idle = [k for k, b in buckets.items() if now - b.updated > self.config.bucket_idle_seconds]
+            for key in idle:
+                buckets.pop(key, None)
+
+    def _shed_request(self, engine: str, kind: str, status_code: int, reason: str, retry_after: float) -> Shed:
+        self._shed[engine][kind] += 1
+        return Shed(status_code, reason, retry_after)
+
+    def _has_slot(self, engine: str) -> bool:
+        config = self.config
+        total = sum(self._inflight.values())
+        return (
+            self._inflight[engine] < config.engine_inflight[engine]
+            and total < config.global_inflight * config.priority_share[engine]
+        )
+
+    def _wait_for_slot(self, engine: str, deadline: float) -> bool:
+        """Queue (lock held) until a slot frees up; False if the queue is full or time runs out"""
+        if self._waiting[engine] >= self.config.queue_depth.get(engine, 0):
+            return False
+        self._waiting[engine] += 1
+        try:
+            while not self._has_slot(engine):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._slot_freed.wait(remaining)
+            return True
+        finally:
+            self._waiting[engine] -= 1
+
+    def queue_timeout(self, engine: str) -> float:
+        return self.config.queue_timeout.get(engine, 0.0)
+
+    def acquire(
+        self,
+        engine: str,
+        client_ip: str,
+        session: Optional[str] = None,
+        timeout: float = 0.0,
+    ) -> None:
+        """
+        Admit one unit of work or raise Shed (429 rate limit, 503 overload).
+        With timeout > 0 this blocks up to that long for a slot (if the
+        engine's queue has room), so call it from a worker thread.
+        """
+        config = self.config
+        now = time.monotonic()
+        with self._lock:
+            self._prune_buckets(now)
+
+            if session is not None:
+                ok, wait = self._bucket(
+                    self._session_buckets, f"{engine}:{session}", config.session_fps, config.session_burst
+                ).try_acquire(now)
+                if not ok:
+                    raise self._shed_request(engine, "rate_limited", 429, "Session frame rate exceeded", wait)
+
+            ok, wait = self._bucket(self._ip_buckets, client_ip, config.ip_fps, config.ip_burst).try_acquire(now)
+            if not ok:
+                raise self._shed_request(engine, "rate_limited", 429, "Client frame rate exceeded", wait)
+
+            if not self._has_slot(engine) and not self._wait_for_slot(engine, now + timeout):
+                raise self._shed_request(
+                    engine, "overloaded", 503, f"Server busy ({engine})", config.retry_after_seconds
+                )
+
+            self._inflight[engine] += 1
+            self._admitted[engine] += 1
+
+    def release(self, engine: str) -> None:
+        with self._lock:
+            self._inflight[engine] = max(0, self._inflight[engine] - 1)
+            self._slot_freed.notify_all()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "inflight": dict(self._inflight),
+                "waiting": dict(self._waiting),
+                "admitted": dict(self._admitted),
+                "shed": {engine: dict(counts) for engine, counts in self._shed.items()},
+                "limits": {
+                    "session_fps": self.config.session_fps,
+                    "ip_fps": self.config.ip_fps,
+                    "engine_inflight": dict(self.config.engine_inflight),
+                    "global_inflight": self.config.global_inflight,
+                },
+            }
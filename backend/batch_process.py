@@ -0,0 +1,252 @@
+"""
+Offline batch processing for Vision Mate.
+Runs face recognition and object detection over a recorded video or an image
+folder without going through HTTP. A reader thread decodes ahead into a
+bounded queue, frames fan out to a pool of worker processes (each holding its
+own SimpleFaceRecognizer and YoloOnnxDetector), and results are written as
+ordered JSONL.
+
+Usage:
+  python batch_process.py walkthrough.mp4 --output walkthrough.jsonl --stride 5 --workers 8
+  python batch_process.py frames/ --output frames.jsonl --no-objects
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from yolo_onnx_detector import PRECISIONS, YoloOnnxDetector, limit_onnxruntime_threads
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+Frame = Tuple[int, float, np.ndarray]  # (frame index, timestamp ms, BGR image)
+
+
+@dataclass
+class BatchConfig:
+    faces: bool = True
+    objects: bool = True
+    dataset_path: str = "dataset"
+    model_path: str = "face_model.lbph"
+    catalog_path: str = "user_catalog.db"
+    yolo_model_path: str = "models/yolo11n.onnx"
+    yolo_weights: str = "yolo11n.pt"
+    yolo_precision: str = "fp32"
+    imgsz: int = 640
+    confidence: float = 0.45
+    max_results: int = 12
+
+
+def iter_frames(source: Path, stride: int = 1) -> Iterator[Frame]:
+    """Every `stride`-th frame of a video file, or every `stride`-th image of a folder (sorted)."""
+    if source.is_dir():
+        images = sorted(p for p in source.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        for index, path in enumerate(images):
+            if index % stride:
+                continue
+            frame = cv2.imread(str(path), cv2.IMREAD_COLOR)
+            if frame is not None:
+                yield index, 0.0, frame
+        return
+
+    capture = cv2.VideoCapture(str(source))
+    if not capture.isOpened():
+        raise FileNotFoundError(f"Cannot open video: {source}")
+    try:
+        index = 0
+        while True:
+            # grab() skips colour conversion for frames we don't keep
+            if not capture.grab():
+                break
+            if index % stride == 0:
+                ok, frame = capture.retrieve()
+                if ok:
+                    yield index, capture.get(cv2.CAP_PROP_POS_MSEC), frame
+            index += 1
+    finally:
+        capture.release()
+
+
+def decode_ahead(frames: Iterator[Frame], depth: int) -> Iterator[Frame]:
+    """Decode on a background thread so workers never wait on the reader."""
+    buffer: "queue.Queue" = queue.Queue(maxsize=depth)
+    done = object()
+    errors = []
+
+    def reader() -> None:
+        try:
+            for frame in frames:
+                buffer.put(frame)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            buffer.put(done)
+
+    threading.Thread(target=reader, name="decode-ahead", daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is done:
+            break
+        yield item
+    if errors:
+        raise errors[0]
+
+
+def _build_engines(config: BatchConfig) -> Tuple[Optional[object], Optional[YoloOnnxDetector]]:
+    recognizer = detector = None
+    if config.faces:
+        from simple_recognizer import SimpleFaceRecognizer
+
+        recognizer = SimpleFaceRecognizer(
+            dataset_path=config.dataset_path,
+            model_path=config.model_path,
+            catalog_path=config.catalog_path,
+            legacy_model_path=None,
+        )
+    if config.objects:
+        detector = YoloOnnxDetector(
+            model_path=config.yolo_model_path,
+            source_weights=config.yolo_weights,
+            imgsz_options=(config.imgsz,),
+            precision=config.yolo_precision,
+        )
+    return recognizer, detector
+
+
+# Per-process engines, created once by the pool initializer
+_config: Optional[BatchConfig] = None
+_recognizer = None
+_detector = None
+_init_error: Optional[str] = None
+
+
+def _init_worker(config: BatchConfig) -> None:
+    global _config, _recognizer, _detector, _init_error
+    # One process per core: keep each worker's native thread pools to one thread
+    cv2.setNumThreads(1)
+    _config = config
+    try:
+        if config.objects:
+            limit_onnxruntime_threads(1)
+        _recognizer, _detector = _build_engines(config)
+    except Exception as exc:
+        # An initializer that raises makes Pool respawn workers forever;
+        # report the error from the first task instead
+        _init_error = f"{type(exc).__name__}: {exc}"
+
+
+def _process_frame(item: Frame) -> Dict:
+    if _init_error is not None:
+        raise RuntimeError(f"Batch worker failed to start: {_init_error}")
+    index, timestamp_ms, frame = item
+    start = time.perf_counter()
+    record: Dict = {"frame": index, "timestamp_ms": round(timestamp_ms, 1)}
+
+    if _recognizer is not None:
+        record["faces"] = [r.to_dict() for r in _recognizer.recognize(frame)]
+    if _detector is not None:
+        objects, detect_ms = _detector.detect(
+            frame,
+            confidence=_config.confidence,
+            max_results=_config.max_results,
+            imgsz=_config.imgsz,
+        )
+        record["objects"] = objects
+        record["detect_ms"] = round(detect_ms, 2)
+
+    record["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return record
+
+
+def run_batch(
+    source: Path,
+    output: Path,
+    config: BatchConfig,
+    stride: int = 1,
+    workers: int = 0,
+    decode_depth: int = 32,
+) -> Dict:
+    """Process every selected frame and write ordered JSONL; returns throughput stats."""
+    workers = workers or os.cpu_count() or 1
+    # Fail fast on bad settings, and export/quantize the model once here
+    # rather than in every worker at the same time
+    _, detector = _build_engines(config)
+    if detector is not None:
+        detector.prepare_model(config.imgsz)
+
+    frames = decode_ahead(iter_frames(source, stride), decode_depth)
+    latencies = []
+    count = 0
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(config,)) as pool, \
+            open(output, "w", encoding="utf-8") as out:
+        # imap keeps input order; a small chunksize keeps workers evenly loaded
+        for record in pool.imap(_process_frame, frames, chunksize=2):
+            out.write(json.dumps(record) + "\n")
+            latencies.append(record["latency_ms"])
+            count += 1
+    elapsed = time.perf_counter() - start
+
+    return {
+        "source": str(source),
+        "frames": count,
+        "stride": stride,
+        "workers": workers,
+        "elapsed_s": round(elapsed, 2),
+        "frames_per_second": round(count / elapsed, 2) if elapsed > 0 else 0.0,
+        "avg_frame_ms": round(sum(latencies) / count, 2) if count else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Batch face recognition and object detection over a video or folder")
+    parser.add_argument("source", help="Video file or folder of images")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL output path")
+    parser.add_argument("--stride", type=int, default=1, help="Process every Nth frame")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: all cores)")
+    parser.add_argument("--decode-depth", type=int, default=32, help="Frames decoded ahead")
+    parser.add_argument("--no-faces", action="store_true", help="Skip face recognition")
+    parser.add_argument("--no-objects", action="store_true", help="Skip object detection")
+    parser.add_argument("--dataset", default="dataset")
+    parser.add_argument("--model", default="face_model.lbph")
+    parser.add_argument("--catalog", default="user_catalog.db")
+    parser.add_argument("--yolo-model", default=os.getenv("YOLO_ONNX_MODEL_PATH", "models/yolo11n.onnx"))
+    parser.add_argument("--yolo-precision", default=os.getenv("YOLO_PRECISION", "fp32"), choices=PRECISIONS)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--confidence", type=float, default=0.45)
+    args = parser.parse_args()
+
+    if args.stride < 1:
+        parser.error("--stride must be >= 1")
+    if args.imgsz <= 0 or args.imgsz % 32:
+        parser.error("--imgsz must be a positive multiple of 32")
+
+    config = BatchConfig(
+        faces=not args.no_faces,
+        objects=not args.no_objects,
+        dataset_path=args.dataset,
+        model_path=args.model,
+        catalog_path=args.catalog,
+        yolo_model_path=args.yolo_model,
+        yolo_precision=args.yolo_precision,
+        imgsz=args.imgsz,
+        confidence=args.confidence,
+    )
+    stats = run_batch(Path(args.source), Path(args.output), config, args.stride, args.workers, args.decode_depth)
+    print(json.dumps(stats, indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
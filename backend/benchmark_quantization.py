@@ -0,0 +1,155 @@
+"""
+FP32 vs INT8 YOLO comparison for VisionMate.
+Runs both engines over the same local images and reports detection agreement
+(boxes matched by label and IoU) alongside per-engine latency.
+
+Usage:
+  python benchmark_quantization.py --images eval_frames --calibration calib_frames --imgsz 640
+"""
+
+import argparse
+import json
+import statistics
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import cv2
+
+from benchmark_navigation import percentile
+from yolo_onnx_detector import CALIBRATION_EXTENSIONS, YoloOnnxDetector
+
+
+def iou(a: Sequence[float], b: Sequence[float]) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match_detections(reference: List[Dict], candidate: List[Dict], iou_threshold: float = 0.5) -> Dict:
+    """
+    Greedy one-to-one matching of candidate boxes to reference boxes, highest
+    score first; a match needs the same label and IoU >= iou_threshold.
+    """
+    unmatched = sorted(range(len(reference)), key=lambda i: -reference[i]["score"])
+    matched_ious: List[float] = []
+    for det in sorted(candidate, key=lambda d: -d["score"]):
+        best_index, best_iou = None, iou_threshold
+        for i in unmatched:
+            if reference[i]["label"] != det["label"]:
+                continue
+            overlap = iou(reference[i]["bbox"], det["bbox"])
+            if overlap >= best_iou:
+                best_index, best_iou = i, overlap
+        if best_index is not None:
+            unmatched.remove(best_index)
+            matched_ious.append(best_iou)
+
+    return {
+        "reference": len(reference),
+        "candidate": len(candidate),
+        "matched": len(matched_ious),
+        "mean_iou": statistics.mean(matched_ious) if matched_ious else 0.0,
+    }
+
+
+def latency_summary(timings_ms: List[float]) -> Dict[str, float]:
+    return {
+        "avg_ms": round(statistics.mean(timings_ms), 2),
+        "p50_ms": round(percentile(timings_ms, 50), 2),
+        "p95_ms": round(percentile(timings_ms, 95), 2),
+    }
+
+
+def compare(
+    images: List[Path],
+    fp32: YoloOnnxDetector,
+    int8: YoloOnnxDetector,
+    imgsz: int,
+    confidence: float,
+    iou_threshold: float,
+) -> Dict:
+    timings: Dict[str, List[float]] = {"fp32": [], "int8": []}
+    totals = {"reference": 0, "candidate": 0, "matched": 0}
+    ious: List[float] = []
+
+    # One warm-up pass each so session creation isn't counted
+    first = cv2.imread(str(images[0]), cv2.IMREAD_COLOR)
+    fp32.detect(first, confidence=confidence, max_results=100, imgsz=imgsz)
+    int8.detect(first, confidence=confidence, max_results=100, imgsz=imgsz)
+
+    for path in images:
+        frame = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if frame is None:
+            continue
+        reference, fp32_ms = fp32.detect(frame, confidence=confidence, max_results=100, imgsz=imgsz)
+        candidate, int8_ms = int8.detect(frame, confidence=confidence, max_results=100, imgsz=imgsz)
+        timings["fp32"].append(fp32_ms)
+        timings["int8"].append(int8_ms)
+
+        result = match_detections(reference, candidate, iou_threshold)
+        for key in totals:
+            totals[key] += result[key]
+        if result["matched"]:
+            ious.append(result["mean_iou"])
+
+    if not timings["fp32"]:
+        raise ValueError("None of the images could be decoded")
+
+    fp32_latency = latency_summary(timings["fp32"])
+    int8_latency = latency_summary(timings["int8"])
+    return {
+        "images": len(timings["fp32"]),
+        "imgsz": imgsz,
+        "iou_threshold": iou_threshold,
+        "agreement": {
+            "fp32_boxes": totals["reference"],
+            "int8_boxes": totals["candidate"],
+            "matched": totals["matched"],
+            # INT8 judged against FP32 as the reference
+            "recall": round(totals["matched"] / totals["reference"], 4) if totals["reference"] else 1.0,
+            "precision": round(totals["matched"] / totals["candidate"], 4) if totals["candidate"] else 1.0,
+            "mean_iou": round(statistics.mean(ious), 4) if ious else 0.0,
+        },
+        "latency": {
+            "fp32": fp32_latency,
+            "int8": int8_latency,
+            "speedup_p50": round(fp32_latency["p50_ms"] / int8_latency["p50_ms"], 2)
+            if int8_latency["p50_ms"] else 0.0,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare FP32 and INT8 YOLO ONNX detection")
+    parser.add_argument("--images", required=True, help="Folder of evaluation images")
+    parser.add_argument("--calibration", default=None, help="Calibration folder (omit for dynamic quantization)")
+    parser.add_argument("--model", default="models/yolo11n.onnx", help="FP32 ONNX model path")
+    parser.add_argument("--weights", default="yolo11n.pt", help="Source weights for export")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--confidence", type=float, default=0.45)
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU needed to count boxes as matching")
+    parser.add_argument("--requantize", action="store_true", help="Rebuild the INT8 model even if present")
+    args = parser.parse_args()
+
+    images = sorted(
+        path for path in Path(args.images).rglob("*")
+        if path.suffix.lower() in CALIBRATION_EXTENSIONS
+    )
+    if not images:
+        raise FileNotFoundError(f"No images found in {args.images}")
+
+    common = dict(model_path=args.model, source_weights=args.weights, imgsz_options=(args.imgsz,))
+    fp32 = YoloOnnxDetector(precision="fp32", **common)
+    int8 = YoloOnnxDetector(precision="int8", calibration_dir=args.calibration, **common)
+    if args.requantize or not int8.model_path_for(args.imgsz).exists():
+        print(f"Quantizing {fp32.model_path_for(args.imgsz)} ...")
+        int8.quantize_int8(args.imgsz)
+
+    report = compare(images, fp32, int8, args.imgsz, args.confidence, args.iou)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Background engine initialization for Vision Mate.
+Lets the API bind its port immediately while heavy engines (face recognizer,
+YOLO detector) load in parallel, and reports per-engine readiness.
+"""
+
+from __future__ import annotations
+
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import Enum
+from threading import Lock
+from typing import Callable, Dict, Optional
+
+
+class EngineState(str, Enum):
+    IDLE = "idle"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class EngineUnavailable(RuntimeError):
+    """Raised when a request needs an engine that is not ready yet."""
+
+    def __init__(self, name: str, state: EngineState, error: Optional[str] = None) -> None:
+        self.name = name
+        self.state = state
+        self.error = error
+        detail = f"Engine '{name}' is {state.value}"
+        if error:
+            detail += f": {error}"
+        super().__init__(detail)
+
+
+@dataclass
+class EngineStatus:
+    name: str
+    loader: Callable[[], None]
+    preload: bool
+    state: EngineState = EngineState.IDLE
+    error: Optional[str] = None
+    started_at: Optional[float] = None
+    ready_at: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        load_ms = None
+        if self.started_at is not None and self.ready_at is not None:
+            load_ms = round((self.ready_at - self.started_at) * 1000, 1)
+        return {
+            "state": self.state.value,
+            "preload": self.preload,
+            "error": self.error,
+            "load_ms": load_ms,
+        }
+
+
+class EngineRegistry:
+    """Tracks engine loaders and runs them on a background thread pool."""
+
+    def __init__(self, max_workers: int = 4, retry_failed_after: float = 30.0) -> None:
+        self._engines: Dict[str, EngineStatus] = {}
+        self._futures: Dict[str, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="engine-init")
+        self._lock = Lock()
+        self.retry_failed_after = retry_failed_after
+
+    def register(self, name: str, loader: Callable[[], None], preload: bool = True) -> None:
+        with self._lock:
+            self._engines[name] = EngineStatus(name=name, loader=loader, preload=preload)
+
+    def _run(self, status: EngineStatus) -> None:
+        try:
+            status.loader()
+        except Exception as exc:
+            print(f"   ⚠️ Engine '{status.name}' failed to initialize: {exc}")
+            traceback.print_exc()
+            status.error = str(exc)
+            status.state = EngineState.FAILED
+            return
+        status.ready_at = time.monotonic()
+        status.state = EngineState.READY
+        print(f"   ✅ Engine '{status.name}' ready ({status.to_dict()['load_ms']} ms)")
+
+    def start(self, name: str) -> Optional[Future]:
+        """Schedule the engine's loader unless it is already loading or ready."""
+        with self._lock:
+            status = self._engines[name]
+            if status.state in (EngineState.LOADING, EngineState.READY):
+                return self._futures.get(name)
+            if (
+                status.state is EngineState.FAILED
+                and status.started_at is not None
+                and time.monotonic() - status.started_at < self.retry_failed_after
+            ):
+                return self._futures.get(name)
+
+            status.state = EngineState.LOADING
+            status.error = None
+            status.started_at = time.monotonic()
+            status.ready_at = None
+            future = self._executor.submit(self._run, status)
+            self._futures[name] = future
+            return future
+
+    def start_all(self) -> None:
+        """Kick off every preload engine in parallel; returns immediately."""
+        for name, status in list(self._engines.items()):
+            if status.preload:
+                self.start(name)
+
+    def wait(self, name: str, timeout: Optional[float] = None) -> bool:
+        future = self._futures.get(name)
+        if future is not None:
+            future.result(timeout=timeout)
+        return self.is_ready(name)
+
+    def state(self, name: str) -> EngineState:
+        return self._engines[name].state
+
+    def is_ready(self, name: str) -> bool:
+        return self._engines[name].state is EngineState.READY
+
+    def require(self, name: str) -> None:
+        """Fail fast if the engine is not ready; lazily starts idle engines."""
+        status = self._engines[name]
+        if status.state is EngineState.READY:
+            return
+        if status.state in (EngineState.IDLE, EngineState.FAILED):
+            self.start(name)
+        raise EngineUnavailable(name, status.state, status.error)
+
+    def all_ready(self) -> bool:
+        """True when every preload engine is ready (on-demand engines don't gate readiness)."""
+        return all(
+            status.state is EngineState.READY
+            for status in self._engines.values()
+            if status.preload
+        )
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {name: status.to_dict() for name, status in self._engines.items()}
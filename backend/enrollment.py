@@ -0,0 +1,109 @@
+"""
+Streaming enrollment for Vision Mate.
+Frames arrive one at a time (e.g. over /ws/enroll); only crops that pass cheap
+quality gates are kept, and the session commits once with a single retrain.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from gallery_condensation import DEFAULT_MIN_DISTANCE
+
+
+@dataclass
+class QualityGates:
+    """Thresholds a face crop must pass to be kept"""
+    min_sharpness: float = 60.0          # variance of the Laplacian at 200x200
+    min_face_size: int = 80              # shorter side of the detected face, in px
+    min_difference: float = DEFAULT_MIN_DISTANCE  # LBPH chi-square to the nearest kept crop
+
+
+class EnrollmentSession:
+    """Collects quality-filtered face crops for one user until a target count is reached."""
+
+    def __init__(self,
+                 recognizer,
+                 user_name: str,
+                 target_count: int = 15,
+                 user_id: Optional[int] = None,
+                 gates: Optional[QualityGates] = None):
+        self.recognizer = recognizer
+        self.user_name = user_name
+        self.user_id = user_id
+        self.target_count = target_count
+        self.gates = gates or QualityGates()
+        self.extractor = recognizer.feature_extractor()
+
+        self.kept_faces: List[np.ndarray] = []
+        self.kept_sharpness: List[float] = []
+        self._kept_histograms: List[np.ndarray] = []
+        self.rejections: Dict[str, int] = {}
+        self.committed = False
+
+    @property
+    def kept(self) -> int:
+        return len(self.kept_faces)
+
+    @property
+    def done(self) -> bool:
+        return self.kept >= self.target_count
+
+    @staticmethod
+    def sharpness(face: np.ndarray) -> float:
+        return float(cv2.Laplacian(face, cv2.CV_64F).var())
+
+    def _check(self, image: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], float, str]:
+        face, reason = self.recognizer.crop_enrollment_face(image)
+        if face is None:
+            return None, None, 0.0, reason
+
+        if min(face.shape[:2]) < self.gates.min_face_size:
+            return None, None, 0.0, "too_small"
+
+        resized = cv2.resize(face, (200, 200))
+        sharpness = self.sharpness(resized)
+        if sharpness < self.gates.min_sharpness:
+            return None, None, sharpness, "blurry"
+
+        histogram = self.extractor.histogram(resized)
+        for kept in self._kept_histograms:
+            if cv2.compareHist(kept, histogram, cv2.HISTCMP_CHISQR_ALT) < self.gates.min_difference:
+                return None, None, sharpness, "duplicate"
+
+        return face, histogram, sharpness, "accepted"
+
+    def offer(self, image: np.ndarray) -> Tuple[bool, str]:
+        """Run the quality gates on one frame; returns (kept, reason)"""
+        if self.committed:
+            return False, "committed"
+        if self.done:
+            return False, "target_reached"
+
+        face, histogram, sharpness, reason = self._check(image)
+        if face is None:
+            self.rejections[reason] = self.rejections.get(reason, 0) + 1
+            return False, reason
+
+        self.kept_faces.append(face)
+        self.kept_sharpness.append(sharpness)
+        self._kept_histograms.append(histogram)
+        return True, reason
+
+    def commit(self) -> Tuple[int, Dict[str, int]]:
+        """Store every kept crop (sharpness as its quality) and retrain once; returns (user_id, training stats)"""
+        if self.committed:
+            raise RuntimeError("Enrollment session already committed")
+        if not self.kept_faces:
+            raise ValueError("No frames passed the quality gates")
+
+        self.user_id = self.recognizer.enroll_faces(
+            self.kept_faces, self.user_name, user_id=self.user_id, qualities=self.kept_sharpness
+        )
+        self.committed = True
+        stats = self.recognizer.train()
+        return self.user_id, stats
@@ -3,22 +3,30 @@ FastAPI Backend for Vision Mate Facial Recognition
 Simple and clean implementation
 """
 
-import io
 import base64
 import time
 import os
 import socket
-from typing import Any, Dict, List, Optional
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import List, Optional, Tuple
 from datetime import datetime
 
-import cv2
 import numpy as np
 import traceback
-from PIL import Image
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
-
+from starlette.concurrency import run_in_threadpool
+
+from admission import AdmissionConfig, AdmissionController, Shed
+from engine_registry import EngineRegistry, EngineUnavailable
+from enrollment import EnrollmentSession
+from frame_store import create_frame_store
+from image_decode import DEFAULT_MAX_PIXELS, DecodedImage, decode_image
+from session_capture import CaptureWriter
 from simple_recognizer import SimpleFaceRecognizer, RecognitionResult
 from yolo_onnx_detector import YoloOnnxDetector
 
@@ -47,19 +55,74 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize recognizer
+# Engines are constructed cheaply here and loaded in the background at startup
 recognizer = SimpleFaceRecognizer(
     dataset_path="dataset",
-    model_path="face_model.yml",
+    model_path="face_model.lbph",
     user_mapping_path="user_mapping.json",
-    confidence_threshold=80.0
+    confidence_threshold=80.0,
+    catalog_path="user_catalog.db",
+    legacy_model_path="face_model.yml",
+    autoload=False,
 )
 
+# uvicorn reads WEB_CONCURRENCY as its default worker count
+WORKER_COUNT = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
 MOBILE_FRAME_TTL_SECONDS = 6
-mobile_frame_store: Dict[str, Dict[str, Any]] = {}
+MOBILE_PRUNE_INTERVAL_SECONDS = 30
+_last_mobile_prune = 0.0
+# Relay sessions must be visible to every worker. `uvicorn --workers N` doesn't
+# tell the app it is one of N processes, so the shared SQLite store is the
+# default; VISIONMATE_FRAME_STORE=memory suits a known single-worker run
+mobile_frame_store = create_frame_store(
+    os.getenv("VISIONMATE_FRAME_STORE", "sqlite"),
+    ttl_seconds=MOBILE_FRAME_TTL_SECONDS,
+    db_path=os.getenv("VISIONMATE_FRAME_DB", "relay_frames.db"),
+)
 yolo_detector = YoloOnnxDetector(
     model_path=os.getenv("YOLO_ONNX_MODEL_PATH", "models/yolo11n.onnx"),
     source_weights=os.getenv("YOLO_SOURCE_WEIGHTS", "yolo11n.pt"),
+    imgsz_options=[int(size) for size in os.getenv("YOLO_IMGSZ_OPTIONS", "320,416,640").split(",")],
+    # fp32 or int8; int8 is quantized on first load (calibrated if a folder is given)
+    precision=os.getenv("YOLO_PRECISION", "fp32").lower(),
+    calibration_dir=os.getenv("YOLO_CALIBRATION_DIR"),
+)
+ENGINE_RETRY_AFTER_SECONDS = 2
+
+# Uploads are decoded at reduced resolution (JPEG DCT scaling) down to what each
+# engine needs; anything over the pixel budget is downsampled or rejected (400)
+MAX_UPLOAD_PIXELS = int(os.getenv("VISIONMATE_MAX_PIXELS", str(DEFAULT_MAX_PIXELS)))
+OVERSIZE_POLICY = os.getenv("VISIONMATE_OVERSIZE_POLICY", "downsample").lower()
+FACE_DECODE_SIDE = int(os.getenv("VISIONMATE_FACE_DECODE_SIDE", "1280"))
+
+
+def load_face_engine() -> None:
+    recognizer.load()
+    if not recognizer.is_trained:
+        print("   Training on dataset...")
+        recognizer.train(import_dataset=True)
+
+
+# Frame-rate caps, in-flight limits and priority shedding (face > object > relay)
+admission = AdmissionController(AdmissionConfig.from_env())
+
+# Face detection/cropping for bulk enrollment runs in parallel (OpenCV releases the GIL)
+enrollment_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("VISIONMATE_ENROLL_WORKERS", str(min(8, os.cpu_count() or 2)))),
+    thread_name_prefix="enroll",
+)
+
+# Opt-in traffic capture for replay_capture.py (VISIONMATE_CAPTURE_DIR)
+capture = CaptureWriter.from_env()
+
+engines = EngineRegistry()
+engines.register("face", load_face_engine, preload=True)
+# YOLO is loaded on first use unless YOLO_WARMUP=true preloads it at startup
+engines.register(
+    "yolo",
+    yolo_detector.warmup,
+    preload=os.getenv("YOLO_WARMUP", "false").lower() == "true",
 )
 
 
@@ -83,6 +146,40 @@ class RegisterFaceRequest(Base64ImageRequest):
     user_name: str = Field(min_length=1, max_length=64)
 
 
+class BulkRegisterUser(BaseModel):
+    user_name: str = Field(min_length=1, max_length=64)
+    # Omit to create a new user; set to add samples to an existing one
+    user_id: Optional[int] = Field(default=None, ge=1)
+    images: List[str] = Field(min_length=1, max_length=100)
+
+
+class BulkRegisterRequest(BaseModel):
+    users: List[BulkRegisterUser] = Field(min_length=1, max_length=50)
+
+
+class BulkImageResult(BaseModel):
+    index: int
+    accepted: bool
+    reason: str
+
+
+class BulkUserResult(BaseModel):
+    user_id: Optional[int]
+    user_name: str
+    accepted: int
+    rejected: int
+    images: List[BulkImageResult]
+    # Set when this user's samples could not be stored (the rest of the batch still trains)
+    error: Optional[str] = None
+
+
+class BulkRegisterResponse(BaseModel):
+    success: bool
+    users: List[BulkUserResult]
+    training: Optional[dict] = None
+    message: str
+
+
 class DeleteUserResponse(BaseModel):
     success: bool
     user_id: int
@@ -99,6 +196,9 @@ class MobileFrameStateResponse(BaseModel):
 class ObjectDetectionRequest(Base64ImageRequest):
     confidence: float = Field(default=0.45, ge=0.2, le=0.95)
     max_results: int = Field(default=12, ge=1, le=40)
+    # Explicit input resolution, or a latency budget the detector fits a resolution to
+    imgsz: Optional[int] = Field(default=None, ge=160, le=1280)
+    latency_budget_ms: Optional[float] = Field(default=None, gt=0, le=10000)
 
 
 class ObjectDetectionItem(BaseModel):
@@ -112,6 +212,7 @@ class ObjectDetectionResponse(BaseModel):
     engine: str
     objects: List[ObjectDetectionItem]
     latency_ms: float
+    imgsz: int
     message: str
 
 
@@ -123,47 +224,139 @@ class NetworkInfoResponse(BaseModel):
 
 
 # Helpers
-def decode_base64_image(b64: str) -> np.ndarray:
+def require_engine(name: str) -> None:
+    try:
+        engines.require(name)
+    except EngineUnavailable as exc:
+        raise HTTPException(
+            503, str(exc), headers={"Retry-After": str(ENGINE_RETRY_AFTER_SECONDS)}
+        )
+
+
+def client_host(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+async def acquire_admission(engine: str, client_ip: str, session: Optional[str] = None) -> None:
+    """Take an admission slot or raise Shed; a contended slot is waited for in a worker thread"""
+    timeout = admission.queue_timeout(engine)
+    if timeout > 0:
+        await run_in_threadpool(admission.acquire, engine, client_ip, session, timeout)
+    else:
+        admission.acquire(engine, client_ip, session)
+
+
+def shed_to_http(exc: Shed) -> HTTPException:
+    return HTTPException(exc.status_code, exc.reason, headers={"Retry-After": exc.retry_after_header})
+
+
+@asynccontextmanager
+async def admitted(engine: str, client_ip: str, session: Optional[str] = None):
+    """Hold an admission slot for the block, or shed with 429/503 + Retry-After"""
+    try:
+        await acquire_admission(engine, client_ip, session)
+    except Shed as exc:
+        raise shed_to_http(exc)
     try:
-        if not b64:
-            raise ValueError("Image payload is required")
-
-        if ',' in b64:
-            b64 = b64.split(',')[1]
-        
-        image_bytes = base64.b64decode(b64)
-        
-        img = Image.open(io.BytesIO(image_bytes))
-        
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        return np.array(img)
+        yield
+    finally:
+        admission.release(engine)
+
+
+@contextmanager
+def admitted_blocking(engine: str, client_ip: str, session: Optional[str] = None):
+    """admitted() for sync endpoints, which already run in the threadpool"""
+    try:
+        admission.acquire(engine, client_ip, session, admission.queue_timeout(engine))
+    except Shed as exc:
+        raise shed_to_http(exc)
+    try:
+        yield
+    finally:
+        admission.release(engine)
+
+
+def decode_base64_bytes(b64: str) -> bytes:
+    if not b64:
+        raise ValueError("Image payload is required")
+    if ',' in b64:
+        b64 = b64.split(',')[1]
+    return base64.b64decode(b64)
+
+
+def decode_upload(b64: str, mode: str, target_side: Optional[int] = None) -> DecodedImage:
+    """Decode straight to the colour mode and working resolution an engine needs"""
+    return decode_image(
+        decode_base64_bytes(b64),
+        mode=mode,
+        target_side=target_side,
+        max_pixels=MAX_UPLOAD_PIXELS,
+        oversize=OVERSIZE_POLICY,
+    )
+
+
+def recognize_image(b64: str) -> List[RecognitionResult]:
+    decoded = decode_upload(b64, "gray", FACE_DECODE_SIDE)
+    results = recognizer.recognize(decoded.image)
+    if decoded.factor == 1:
+        return results
+
+    # Report face boxes in the coordinates of the uploaded image
+    scale_x, scale_y = decoded.scale
+    for r in results:
+        if r.face_location:
+            top, right, bottom, left = r.face_location
+            r.face_location = (
+                round(top * scale_y), round(right * scale_x),
+                round(bottom * scale_y), round(left * scale_x),
+            )
+    return results
+
+
+def detect_image(data: ObjectDetectionRequest, imgsz: int) -> Tuple[List[dict], float, int]:
+    """Detections in upload coordinates, latency, and the resolution actually used"""
+    # A size that cannot be loaded falls back to the default resolution
+    imgsz = yolo_detector.ensure_imgsz(imgsz)
+    # Letterboxing shrinks to imgsz anyway; decode no larger than that
+    decoded = decode_upload(data.image, "bgr", imgsz)
+    objects, latency_ms = yolo_detector.detect(
+        image_bgr=decoded.image,
+        confidence=data.confidence,
+        max_results=data.max_results,
+        imgsz=imgsz,
+    )
+    if decoded.factor > 1:
+        scale_x, scale_y = decoded.scale
+        for obj in objects:
+            x1, y1, x2, y2 = obj["bbox"]
+            obj["bbox"] = [x1 * scale_x, y1 * scale_y, x2 * scale_x, y2 * scale_y]
+    return objects, latency_ms, imgsz
+
+
+def decode_face_image(b64: str) -> np.ndarray:
+    return decode_upload(b64, "gray", FACE_DECODE_SIDE).image
+
+
+def prepare_enrollment_image(b64: str) -> Tuple[Optional[np.ndarray], str]:
+    """Decode and crop one bulk-enrollment image; returns (crop, reason)"""
+    try:
+        img = decode_face_image(b64)
     except Exception as e:
-        print(f"❌ Error in decode_base64_image: {e}")
-        traceback.print_exc()
-        raise
-
-
-def result_to_dict(r: RecognitionResult) -> dict:
-    """Convert RecognitionResult to JSON-serializable dict matching frontend interface"""
-    face_loc = None
-    if r.face_location:
-        # Tuple is (top, right, bottom, left)
-        face_loc = {
-            "top": int(r.face_location[0]),
-            "right": int(r.face_location[1]),
-            "bottom": int(r.face_location[2]),
-            "left": int(r.face_location[3])
-        }
+        return None, f"decode_failed: {e}"
+    return recognizer.crop_enrollment_face(img)
 
-    return {
-        "user_id": int(r.user_id) if r.user_id is not None else None,
-        "user_name": str(r.user_name) if r.user_name else "Unknown",
-        "confidence": float(r.confidence),
-        "is_known": bool(r.is_known),
-        "face_location": face_loc
-    }
+
+def offer_enrollment_frame(session: EnrollmentSession, b64: str) -> Tuple[bool, str]:
+    """Decode one streamed enrollment frame and run the quality gates; returns (kept, reason)"""
+    try:
+        img = decode_face_image(b64)
+    except Exception as e:
+        return False, f"decode_failed: {e}"
+    try:
+        return session.offer(img)
+    except Exception as e:
+        print(f"❌ Error in enrollment offer: {e}")
+        return False, f"offer_failed: {e}"
 
 
 def normalize_session_id(raw_session_id: str) -> str:
@@ -175,15 +368,31 @@ def normalize_session_id(raw_session_id: str) -> str:
     return session_id
 
 
+async def capture_frame(channel: str, session: str, image_b64: str) -> None:
+    """Record an incoming frame for replay_capture.py when VISIONMATE_CAPTURE_DIR is set"""
+    if capture is None:
+        return
+    try:
+        # Arrival time is taken here; base64 decoding and the file write run in the threadpool
+        await run_in_threadpool(capture.record, channel, session, image_b64, time.monotonic())
+    except Exception as e:
+        # Capture is a diagnostic; never fail the request over it
+        print(f"⚠️ Could not capture {channel} frame: {e}")
+
+
 def prune_mobile_sessions() -> None:
-    now = time.time()
-    stale = [
-        key
-        for key, value in mobile_frame_store.items()
-        if now - float(value.get("updated_epoch", 0)) > MOBILE_FRAME_TTL_SECONDS
-    ]
-    for key in stale:
-        mobile_frame_store.pop(key, None)
+    """Reclaim expired relay frames at most every MOBILE_PRUNE_INTERVAL_SECONDS (reads skip them anyway)"""
+    global _last_mobile_prune
+    now = time.monotonic()
+    if now - _last_mobile_prune < MOBILE_PRUNE_INTERVAL_SECONDS:
+        return
+    _last_mobile_prune = now
+    mobile_frame_store.prune()
+
+
+def read_mobile_frame(session_id: str) -> Optional[dict]:
+    prune_mobile_sessions()
+    return mobile_frame_store.get(session_id)
 
 
 def get_lan_ipv4_candidates() -> List[str]:
@@ -223,6 +432,30 @@ async def root():
     return {"service": "Vision Mate Face API", "status": "running"}
 
 
+@app.get("/health/live")
+async def health_live():
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    ready = engines.all_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "engines": engines.snapshot(),
+            # What /object-detect-base64 picks its resolution from
+            "yolo_latency_ms": yolo_detector.latency_profile(),
+        },
+    )
+
+
+@app.get("/admission/stats")
+async def admission_stats():
+    return admission.stats()
+
+
 @app.get("/network-info", response_model=NetworkInfoResponse)
 async def network_info():
     return {
@@ -235,16 +468,20 @@ async def network_info():
 
 @app.get("/users", response_model=UsersResponse)
 async def list_users():
+    require_engine("face")
     users = recognizer.list_users()
     return {"users": users, "count": len(users)}
 
 
 @app.delete("/users/{user_id}", response_model=DeleteUserResponse)
-async def delete_user(user_id: int):
+async def delete_user(user_id: int, request: Request):
     if user_id <= 0:
         raise HTTPException(400, "Invalid user ID")
 
-    removed = recognizer.remove_user(user_id)
+    require_engine("face")
+    # Removing a user retrains on the remaining samples
+    async with admitted("train", client_host(request)):
+        removed = await run_in_threadpool(recognizer.remove_user, user_id)
     if not removed:
         raise HTTPException(404, f"User {user_id} not found")
 
@@ -256,62 +493,142 @@ async def delete_user(user_id: int):
 
 
 @app.post("/recognize-base64")
-async def recognize_base64(data: Base64ImageRequest):
-    try:
-        img = decode_base64_image(data.image)
-        results = recognizer.recognize(img)
-        faces = [result_to_dict(r) for r in results]
-        return {
-            "success": True,
-            "faces": faces,
-            "message": f"{len(faces)} face(s)",
-            "timestamp": datetime.now().isoformat()
-        }
-    except ValueError as e:
-        raise HTTPException(400, str(e))
-    except Exception as e:
-        print(f"❌ Error in recognize_base64: {str(e)}")
-        traceback.print_exc()
-        raise HTTPException(500, str(e))
+async def recognize_base64(data: Base64ImageRequest, request: Request):
+    require_engine("face")
+    async with admitted("face", client_host(request)):
+        try:
+            # Off the event loop, so admitted requests actually run concurrently
+            results = await run_in_threadpool(recognize_image, data.image)
+            faces = [r.to_dict() for r in results]
+            return {
+                "success": True,
+                "faces": faces,
+                "message": f"{len(faces)} face(s)",
+                "timestamp": datetime.now().isoformat()
+            }
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        except Exception as e:
+            print(f"❌ Error in recognize_base64: {str(e)}")
+            traceback.print_exc()
+            raise HTTPException(500, str(e))
+
+
+def register_image(b64: str, name: str) -> Optional[int]:
+    return recognizer.register_user(decode_face_image(b64), name)
 
 
 @app.post("/register-base64")
-async def register_base64(data: RegisterFaceRequest):
+async def register_base64(data: RegisterFaceRequest, request: Request):
+    require_engine("face")
+    name = data.user_name.strip()
+    if not name:
+        raise HTTPException(400, "Name required")
+    
+    # Registration retrains the model, so it shares the training slot
+    async with admitted("train", client_host(request)):
+        try:
+            user_id = await run_in_threadpool(register_image, data.image, name)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        except Exception as e:
+            raise HTTPException(500, str(e))
+    
+    if user_id is None:
+        raise HTTPException(400, "No face detected")
+    return {
+        "success": True,
+        "user_id": user_id,
+        "user_name": name,
+        "message": f"{name} registered successfully"
+    }
+
+
+@app.post("/register-bulk", response_model=BulkRegisterResponse)
+def register_bulk(data: BulkRegisterRequest, request: Request):
+    # Sync endpoint: FastAPI runs it in its threadpool, keeping the event loop free
+    require_engine("face")
+
+    names = [entry.user_name.strip() for entry in data.users]
+    if not all(names):
+        raise HTTPException(400, "Name required")
+    # Samples go to existing users as they are (no rename); unknown IDs are never created
+    for index, entry in enumerate(data.users):
+        if entry.user_id is not None:
+            stored_name = recognizer.catalog.get_user_name(entry.user_id)
+            if stored_name is None:
+                raise HTTPException(404, f"User {entry.user_id} not found")
+            names[index] = stored_name
+
+    with admitted_blocking("train", client_host(request)):
+        return enroll_bulk(data, names)
+
+
+def enroll_bulk(data: BulkRegisterRequest, names: List[str]) -> dict:
     try:
-        name = data.user_name.strip()
-        if not name:
-            raise HTTPException(400, "Name required")
-        
-        img = decode_base64_image(data.image)
-        user_id = recognizer.get_next_user_id()
-        
-        if recognizer.add_face(img, user_id, name):
-            return {
-                "success": True,
+        all_images = [b64 for entry in data.users for b64 in entry.images]
+        outcomes = list(enrollment_executor.map(prepare_enrollment_image, all_images))
+
+        users = []
+        offset = 0
+        for entry, name in zip(data.users, names):
+            user_outcomes = outcomes[offset:offset + len(entry.images)]
+            offset += len(entry.images)
+
+            faces = [crop for crop, _reason in user_outcomes if crop is not None]
+            user_id = entry.user_id
+            error = None
+            if faces:
+                try:
+                    user_id = recognizer.enroll_faces(faces, name, user_id=entry.user_id)
+                except Exception as e:
+                    # Nothing of this user's was kept; earlier users still get trained below
+                    print(f"❌ Could not store samples for {name}: {e}")
+                    error = str(e)
+                    user_outcomes = [
+                        (None, "store_failed" if crop is not None else reason)
+                        for crop, reason in user_outcomes
+                    ]
+                    faces = []
+
+            users.append({
                 "user_id": user_id,
                 "user_name": name,
-                "message": f"{name} registered successfully"
-            }
-        raise HTTPException(400, "No face detected")
-    except ValueError as e:
-        raise HTTPException(400, str(e))
-    except HTTPException:
-        raise
+                "accepted": len(faces),
+                "rejected": len(user_outcomes) - len(faces),
+                "images": [
+                    {"index": index, "accepted": crop is not None, "reason": reason}
+                    for index, (crop, reason) in enumerate(user_outcomes)
+                ],
+                "error": error,
+            })
+
+        accepted_total = sum(user["accepted"] for user in users)
+        # One model update for the whole batch
+        training = recognizer.train() if accepted_total else None
+
+        return {
+            "success": accepted_total > 0,
+            "users": users,
+            "training": training,
+            "message": f"{accepted_total} of {len(all_images)} image(s) enrolled",
+        }
     except Exception as e:
+        print(f"❌ Error in register_bulk: {e}")
+        traceback.print_exc()
         raise HTTPException(500, str(e))
 
 
 @app.post("/mobile-stream/{session_id}/frame", response_model=MobileFrameStateResponse)
-async def receive_mobile_frame(session_id: str, data: Base64ImageRequest):
+async def receive_mobile_frame(session_id: str, data: Base64ImageRequest, request: Request):
     normalized_session = normalize_session_id(session_id)
     now_epoch = time.time()
     now_iso = datetime.now().isoformat()
+    await capture_frame("relay", normalized_session, data.image)
 
-    mobile_frame_store[normalized_session] = {
-        "image": data.image,
-        "updated_at": now_iso,
-        "updated_epoch": now_epoch,
-    }
+    async with admitted("relay", client_host(request), session=normalized_session):
+        # SQLite may wait on another worker's write lock; keep that off the event loop
+        await run_in_threadpool(mobile_frame_store.put, normalized_session, data.image, now_iso, now_epoch)
 
     return {
         "success": True,
@@ -323,9 +640,9 @@ async def receive_mobile_frame(session_id: str, data: Base64ImageRequest):
 @app.get("/mobile-stream/{session_id}/latest", response_model=MobileFrameStateResponse)
 async def get_mobile_frame(session_id: str):
     normalized_session = normalize_session_id(session_id)
-    prune_mobile_sessions()
+    await capture_frame("poll", normalized_session, "")
 
-    frame_data = mobile_frame_store.get(normalized_session)
+    frame_data = await run_in_threadpool(read_mobile_frame, normalized_session)
     if not frame_data:
         return {
             "success": True,
@@ -341,63 +658,195 @@ async def get_mobile_frame(session_id: str):
 
 
 @app.post("/object-detect-base64", response_model=ObjectDetectionResponse)
-async def detect_objects_base64(data: ObjectDetectionRequest):
-    try:
-        image_rgb = decode_base64_image(data.image)
-        image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
-
-        objects, latency_ms = yolo_detector.detect(
-            image_bgr=image_bgr,
-            confidence=data.confidence,
-            max_results=data.max_results,
-        )
+async def detect_objects_base64(data: ObjectDetectionRequest, request: Request):
+    require_engine("yolo")
+    async with admitted("object", client_host(request)):
+        try:
+            imgsz = yolo_detector.resolve_imgsz(data.imgsz, data.latency_budget_ms)
+            objects, latency_ms, imgsz = await run_in_threadpool(detect_image, data, imgsz)
 
-        return {
-            "success": True,
-            "engine": "yolo-onnx",
-            "objects": objects,
-            "latency_ms": round(latency_ms, 2),
-            "message": f"{len(objects)} object(s) detected",
-        }
-    except ValueError as exc:
-        raise HTTPException(400, str(exc))
-    except RuntimeError as exc:
-        raise HTTPException(503, str(exc))
-    except Exception as exc:
-        print(f"❌ Error in detect_objects_base64: {exc}")
-        traceback.print_exc()
-        raise HTTPException(500, str(exc))
+            return {
+                "success": True,
+                "engine": yolo_detector.engine_name,
+                "objects": objects,
+                "latency_ms": round(latency_ms, 2),
+                "imgsz": imgsz,
+                "message": f"{len(objects)} object(s) detected",
+            }
+        except ValueError as exc:
+            raise HTTPException(400, str(exc))
+        except RuntimeError as exc:
+            raise HTTPException(503, str(exc))
+        except Exception as exc:
+            print(f"❌ Error in detect_objects_base64: {exc}")
+            traceback.print_exc()
+            raise HTTPException(500, str(exc))
 
 
 @app.post("/train")
-async def train(max_samples: int = Query(default=50, ge=5, le=300)):
-    try:
-        stats = recognizer.train(max_per_user=max_samples)
-        return {
-            "success": True,
-            "stats": stats,
-            "message": f"Training complete with up to {max_samples} samples per user"
-        }
-    except Exception as e:
-        raise HTTPException(500, str(e))
+async def train(
+    request: Request,
+    max_samples: int = Query(default=50, ge=5, le=300),
+    import_dataset: bool = Query(default=False),
+):
+    require_engine("face")
+    async with admitted("train", client_host(request)):
+        try:
+            stats = await run_in_threadpool(
+                recognizer.train, max_per_user=max_samples, import_dataset=import_dataset
+            )
+        except Exception as e:
+            raise HTTPException(500, str(e))
+    return {
+        "success": True,
+        "stats": stats,
+        "message": f"Training complete with up to {max_samples} samples per user"
+    }
 
 
 # WebSocket for real-time
 @app.websocket("/ws/recognize")
 async def ws_recognize(ws: WebSocket):
     await ws.accept()
+    client_ip = ws.client.host if ws.client else "unknown"
+    connection_id = uuid.uuid4().hex
     try:
         while True:
             data = await ws.receive_json()
             try:
-                img = decode_base64_image(data.get("image", ""))
-                results = recognizer.recognize(img)
+                image = data.get("image", "")
+                # Recorded on arrival, before admission, so shed frames replay too
+                await capture_frame("recognize", connection_id, image)
+                engines.require("face")
+                admission.acquire("face", client_ip, session=connection_id)
+            except Shed as e:
+                # Drop this frame; the client keeps streaming
+                await ws.send_json({"success": False, "error": e.reason, "retry_after": e.retry_after})
+                continue
+            except Exception as e:
+                await ws.send_json({"success": False, "error": str(e)})
+                continue
+            try:
+                results = await run_in_threadpool(recognize_image, image)
                 await ws.send_json({
                     "success": True,
-                    "faces": [result_to_dict(r) for r in results]
+                    "faces": [r.to_dict() for r in results]
                 })
             except Exception as e:
                 await ws.send_json({"success": False, "error": str(e)})
+            finally:
+                admission.release("face")
+    except WebSocketDisconnect:
+        pass
+
+
+@app.websocket("/ws/enroll")
+async def ws_enroll(ws: WebSocket):
+    """
+    Streaming enrollment. First message: {"user_name", "target"?, "user_id"?}.
+    Then {"image": b64} frames, each answered with the gate result; the session
+    commits (one retrain) when the target is reached or on {"action": "commit"}.
+    {"action": "cancel"} discards everything kept so far.
+    """
+    await ws.accept()
+    try:
+        start = await ws.receive_json()
+        user_name = str(start.get("user_name", "")).strip()[:64]
+        try:
+            target = int(start.get("target", 15))
+            user_id = int(start["user_id"]) if start.get("user_id") is not None else None
+        except (TypeError, ValueError):
+            target, user_id = 0, None
+        if not user_name or not 1 <= target <= 100:
+            await ws.send_json({"type": "error", "error": "user_name and a target of 1-100 are required"})
+            await ws.close()
+            return
+        try:
+            engines.require("face")
+        except EngineUnavailable as e:
+            await ws.send_json({"type": "error", "error": str(e)})
+            await ws.close()
+            return
+
+        if user_id is not None:
+            stored_name = await run_in_threadpool(recognizer.catalog.get_user_name, user_id)
+            if stored_name is None:
+                await ws.send_json({"type": "error", "error": f"User {user_id} not found"})
+                await ws.close()
+                return
+            user_name = stored_name
+
+        client_ip = ws.client.host if ws.client else "unknown"
+        connection_id = uuid.uuid4().hex
+        session = EnrollmentSession(recognizer, user_name, target_count=target, user_id=user_id)
+        await ws.send_json({"type": "started", "user_name": user_name, "target": target})
+
+        while True:
+            data = await ws.receive_json()
+            action = data.get("action")
+            if action == "cancel":
+                await ws.send_json({"type": "cancelled", "kept": session.kept})
+                break
+
+            if action != "commit":
+                try:
+                    await acquire_admission("enroll", client_ip, session=connection_id)
+                except Shed as e:
+                    await ws.send_json({
+                        "type": "frame",
+                        "accepted": False,
+                        "reason": "shed",
+                        "error": e.reason,
+                        "retry_after": e.retry_after,
+                        "kept": session.kept,
+                        "target": session.target_count,
+                    })
+                    continue
+                try:
+                    # Decode, Haar detection and LBPH gating are CPU work; keep them off the event loop
+                    accepted, reason = await run_in_threadpool(offer_enrollment_frame, session, data.get("image", ""))
+                finally:
+                    admission.release("enroll")
+                await ws.send_json({
+                    "type": "frame",
+                    "accepted": accepted,
+                    "reason": reason,
+                    "kept": session.kept,
+                    "target": session.target_count,
+                })
+                if not session.done:
+                    continue
+
+            try:
+                await acquire_admission("train", client_ip)
+            except Shed as e:
+                # Kept crops stay in the session; the client can send "commit" again
+                await ws.send_json({"type": "error", "error": e.reason, "retry_after": e.retry_after})
+                continue
+            try:
+                # Retraining can take a while; keep the event loop responsive
+                user_id, stats = await run_in_threadpool(session.commit)
+            except ValueError as e:
+                await ws.send_json({"type": "error", "error": str(e)})
+                continue
+            except Exception as e:
+                # e.g. a sample that could not be written; tell the client instead of dropping the socket
+                print(f"❌ Error committing enrollment: {e}")
+                traceback.print_exc()
+                await ws.send_json({"type": "error", "error": f"commit_failed: {e}"})
+                continue
+            finally:
+                admission.release("train")
+            await ws.send_json({
+                "type": "committed",
+                "user_id": user_id,
+                "user_name": user_name,
+                "kept": session.kept,
+                "rejections": session.rejections,
+                "training": stats,
+            })
+            break
+        await ws.close()
     except WebSocketDisconnect:
         pass
 
@@ -406,24 +855,22 @@ async def ws_recognize(ws: WebSocket):
 @app.on_event("startup")
 async def startup():
     print("\n🚀 Vision Mate Face API Starting...")
-    print(f"   Users: {recognizer.list_users()}")
-    print(f"   Trained: {recognizer.is_trained}")
-    
-    if not recognizer.is_trained:
-        print("   Training on dataset...")
-        recognizer.train()
+    # Non-blocking: the port opens now, engines report progress on /health/ready
+    engines.start_all()
+    print(f"   Engines: {engines.snapshot()}")
+    print("✅ Accepting connections (engines loading in background)")
 
-    if os.getenv("YOLO_WARMUP", "false").lower() == "true":
-        try:
-            print("   Warming up YOLO ONNX detector...")
-            yolo_detector.warmup()
-            print("   YOLO ONNX ready")
-        except Exception as exc:
-            print(f"   ⚠️ YOLO warmup skipped: {exc}")
-    
-    print("✅ Ready!")
+
+@app.on_event("shutdown")
+async def shutdown():
+    if capture is not None:
+        capture.close()
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if WORKER_COUNT > 1:
+        # Workers need an import string; each one memory-maps the same model file
+        uvicorn.run("face_recognition_api:app", host="0.0.0.0", port=8000, workers=WORKER_COUNT)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,152 @@
+"""
+Mobile relay frame stores for Vision Mate.
+The in-memory store serves a single worker; the SQLite store is shared by
+every worker process on the node, so relay sessions work with --workers N.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Optional
+
+
+class FrameStore(ABC):
+    """
+    Latest-frame-per-session store used by the mobile relay endpoints.
+    get() never returns an expired frame, so prune() only reclaims space and
+    can run on an interval rather than on every read.
+    """
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    def put(self, session_id: str, image: str, updated_at: str, updated_epoch: float) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def prune(self) -> None:
+        ...
+
+
+class InMemoryFrameStore(FrameStore):
+    """Process-local store (single worker)."""
+
+    def __init__(self, ttl_seconds: float) -> None:
+        super().__init__(ttl_seconds)
+        self._frames: Dict[str, Dict[str, Any]] = {}
+        self._lock = Lock()
+
+    def put(self, session_id: str, image: str, updated_at: str, updated_epoch: float) -> None:
+        with self._lock:
+            self._frames[session_id] = {
+                "image": image,
+                "updated_at": updated_at,
+                "updated_epoch": updated_epoch,
+            }
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            frame = self._frames.get(session_id)
+            if not frame or float(frame.get("updated_epoch", 0)) < cutoff:
+                return None
+            return dict(frame)
+
+    def prune(self) -> None:
+        now = time.time()
+        with self._lock:
+            stale = [
+                key
+                for key, value in self._frames.items()
+                if now - float(value.get("updated_epoch", 0)) > self.ttl_seconds
+            ]
+            for key in stale:
+                self._frames.pop(key, None)
+
+
+class SQLiteFrameStore(FrameStore):
+    """Cross-process store backed by a local WAL-mode SQLite file."""
+
+    def __init__(self, ttl_seconds: float, db_path: str = "relay_frames.db", timeout: float = 5.0) -> None:
+        super().__init__(ttl_seconds)
+        self.db_path = Path(db_path)
+        self.timeout = timeout
+        # The file is created on first use, not when the API module is imported
+        self._schema_ready = False
+        self._schema_lock = Lock()
+
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS frames ("
+            "  session_id TEXT PRIMARY KEY,"
+            "  image TEXT NOT NULL,"
+            "  updated_at TEXT NOT NULL,"
+            "  updated_epoch REAL NOT NULL"
+            ")"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_frames_epoch ON frames(updated_epoch)")
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                    conn = sqlite3.connect(str(self.db_path), timeout=self.timeout, isolation_level=None)
+                    try:
+                        self._create_schema(conn)
+                    finally:
+                        conn.close()
+                    self._schema_ready = True
+        conn = sqlite3.connect(str(self.db_path), timeout=self.timeout, isolation_level=None)
+        # Relay frames are disposable; don't fsync on every upload
+        conn.execute("PRAGMA synchronous=OFF")
+        return conn
+
+    def put(self, session_id: str, image: str, updated_at: str, updated_epoch: float) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO frames (session_id, image, updated_at, updated_epoch) "
+                "VALUES (?, ?, ?, ?)",
+                (session_id, image, updated_at, updated_epoch),
+            )
+        finally:
+            conn.close()
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT image, updated_at, updated_epoch FROM frames WHERE session_id = ? AND updated_epoch >= ?",
+                (session_id, time.time() - self.ttl_seconds),
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {"image": row[0], "updated_at": row[1], "updated_epoch": row[2]}
+
+    def prune(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM frames WHERE updated_epoch < ?", (time.time() - self.ttl_seconds,))
+        finally:
+            conn.close()
+
+
+def create_frame_store(kind: str, ttl_seconds: float, db_path: str = "relay_frames.db") -> FrameStore:
+    if kind == "memory":
+        return InMemoryFrameStore(ttl_seconds)
+    if kind == "sqlite":
+        return SQLiteFrameStore(ttl_seconds, db_path=db_path)
+    raise ValueError(f"Unknown frame store '{kind}' (expected 'memory' or 'sqlite')")
@@ -0,0 +1,163 @@
+"""
+Gallery condensation for Vision Mate.
+Video enrollments produce many near-identical crops; every one of them costs a
+chi-square comparison on each predict. This keeps a diverse, capped subset per
+user (greedy farthest-point selection on LBPH histogram distance) and can
+report the accuracy/latency effect on a held-out split.
+
+Usage:
+  python gallery_condensation.py --max-per-user 30 --min-distance 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from lbph_gallery import LBPHGallery
+
+
+DEFAULT_MIN_DISTANCE = 10.0
+
+
+def _chi2(a: np.ndarray, b: np.ndarray) -> float:
+    return cv2.compareHist(a, b, cv2.HISTCMP_CHISQR_ALT)
+
+
+def condense(histograms: np.ndarray, max_keep: int, min_distance: float = DEFAULT_MIN_DISTANCE) -> List[int]:
+    """
+    Indices of a diverse subset of one user's histograms.
+
+    Starts from the sample closest to the user's mean histogram, then keeps
+    adding the sample farthest from everything already kept. Stops at max_keep
+    or when the farthest remaining sample is within min_distance of a kept one
+    (i.e. everything left is a near-duplicate).
+    """
+    count = len(histograms)
+    if count == 0 or max_keep <= 0:
+        return []
+
+    rows = [np.ascontiguousarray(h, dtype=np.float32).reshape(-1) for h in histograms]
+    mean = np.mean(np.vstack(rows), axis=0).astype(np.float32)
+    first = int(np.argmin([_chi2(row, mean) for row in rows]))
+
+    kept = [first]
+    # Distance from each sample to its nearest kept sample
+    nearest = np.array([_chi2(row, rows[first]) for row in rows], dtype=np.float64)
+    nearest[first] = -1.0
+
+    while len(kept) < min(max_keep, count):
+        candidate = int(np.argmax(nearest))
+        if nearest[candidate] < min_distance:
+            break
+        kept.append(candidate)
+        nearest[candidate] = -1.0
+        for i, row in enumerate(rows):
+            if nearest[i] >= 0:
+                nearest[i] = min(nearest[i], _chi2(row, rows[candidate]))
+
+    return sorted(kept)
+
+
+def _gallery(histograms_by_user: Dict[int, np.ndarray], params: Dict) -> LBPHGallery:
+    histograms = [h for h in histograms_by_user.values() if len(h)]
+    labels = [np.full(len(h), user_id, dtype=np.int32) for user_id, h in histograms_by_user.items() if len(h)]
+    return LBPHGallery(
+        histograms=np.vstack(histograms).astype(np.float32),
+        labels=np.concatenate(labels),
+        **params,
+    )
+
+
+def _score(gallery: LBPHGallery, holdout: Dict[int, np.ndarray]) -> Dict[str, float]:
+    correct = total = 0
+    start = time.perf_counter()
+    for user_id, queries in holdout.items():
+        for query in queries:
+            dists = gallery.distances(query)
+            correct += int(gallery.labels[int(np.argmin(dists))] == user_id)
+            total += 1
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return {
+        "gallery_size": len(gallery),
+        "accuracy": round(correct / total, 4) if total else 0.0,
+        "avg_predict_ms": round(elapsed_ms / total, 3) if total else 0.0,
+    }
+
+
+def evaluate_condensation(
+    histograms_by_user: Dict[int, np.ndarray],
+    max_keep: int,
+    min_distance: float = DEFAULT_MIN_DISTANCE,
+    holdout_every: int = 5,
+    params: Dict = None,
+) -> Dict:
+    """
+    Hold out every Nth sample per user, then compare the full training gallery
+    against its condensed version on the held-out queries.
+    """
+    params = params or {'radius': 1, 'neighbors': 8, 'grid_x': 8, 'grid_y': 8}
+    train: Dict[int, np.ndarray] = {}
+    holdout: Dict[int, np.ndarray] = {}
+    condensed: Dict[int, np.ndarray] = {}
+    removed: Dict[int, int] = {}
+
+    for user_id, hists in histograms_by_user.items():
+        mask = np.arange(len(hists)) % holdout_every == holdout_every - 1
+        train[user_id] = hists[~mask]
+        holdout[user_id] = hists[mask]
+        keep = condense(train[user_id], max_keep, min_distance)
+        condensed[user_id] = train[user_id][keep]
+        removed[user_id] = len(train[user_id]) - len(keep)
+
+    if not any(len(h) for h in train.values()):
+        raise ValueError("No training samples to evaluate")
+
+    return {
+        "max_keep": max_keep,
+        "min_distance": min_distance,
+        "removed_per_user": removed,
+        "removed_total": sum(removed.values()),
+        "full": _score(_gallery(train, params), holdout),
+        "condensed": _score(_gallery(condensed, params), holdout),
+    }
+
+
+def main() -> None:
+    from simple_recognizer import SimpleFaceRecognizer
+
+    parser = argparse.ArgumentParser(description="Report the effect of gallery condensation")
+    parser.add_argument("--dataset", default="dataset")
+    parser.add_argument("--catalog", default="user_catalog.db")
+    parser.add_argument("--max-per-user", type=int, default=30)
+    parser.add_argument("--min-distance", type=float, default=DEFAULT_MIN_DISTANCE)
+    parser.add_argument("--holdout-every", type=int, default=5)
+    args = parser.parse_args()
+
+    recognizer = SimpleFaceRecognizer(
+        dataset_path=args.dataset,
+        catalog_path=args.catalog,
+        legacy_model_path=None,
+    )
+    samples_by_user, _failed = recognizer.sample_histograms()
+    histograms_by_user = {
+        user_id: np.vstack([h for _, h in entries])
+        for user_id, entries in samples_by_user.items()
+    }
+    report = evaluate_condensation(
+        histograms_by_user,
+        max_keep=args.max_per_user,
+        min_distance=args.min_distance,
+        holdout_every=args.holdout_every,
+        params=recognizer.lbph_params,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Engine-aware image decoding for Vision Mate.
+Uploads are usually phone JPEGs far larger than any engine needs. The header
+is probed first (cheap, no pixel data), then the image is decoded straight to
+the working resolution with libjpeg's DCT-domain scaling (1/2, 1/4, 1/8) and,
+for face recognition, straight to grayscale. A pixel budget bounds the
+decoded size so one oversized upload can't spike memory.
+"""
+
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+DEFAULT_MAX_PIXELS = 50_000_000
+OVERSIZE_POLICIES = ("downsample", "reject")
+MODES = ("gray", "bgr", "rgb")
+REDUCTION_FACTORS = (8, 4, 2, 1)
+
+# Keep pixels in stored order, matching the PIL decode this replaces (and the
+# header dimensions used for the reduction factor)
+_IGNORE_ORIENTATION = cv2.IMREAD_IGNORE_ORIENTATION
+_READ_FLAGS = {
+    "gray": {1: cv2.IMREAD_GRAYSCALE, 2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+             4: cv2.IMREAD_REDUCED_GRAYSCALE_4, 8: cv2.IMREAD_REDUCED_GRAYSCALE_8},
+    "bgr": {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+            4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8},
+}
+
+
+class ImageTooLarge(ValueError):
+    """Upload exceeds the pixel budget (or can't be reduced enough to fit it)."""
+
+
+@dataclass
+class DecodedImage:
+    image: np.ndarray
+    original_size: Tuple[int, int]  # (width, height) as stored in the file
+    factor: int                     # DCT reduction applied at decode time
+
+    @property
+    def scale(self) -> Tuple[float, float]:
+        """Original pixels per decoded pixel, (x, y)"""
+        height, width = self.image.shape[:2]
+        return self.original_size[0] / width, self.original_size[1] / height
+
+
+def probe_size(data: bytes) -> Tuple[int, int]:
+    """(width, height) from the image header without decoding pixels"""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return img.size
+    except Image.DecompressionBombError as exc:
+        raise ImageTooLarge(str(exc)) from exc
+
+
+def reduction_factor(width: int, height: int, target_side: Optional[int], max_pixels: int) -> int:
+    """
+    Largest of 1/2/4/8 that keeps the long side at or above target_side, then
+    raised further if needed so the decoded image fits max_pixels.
+    """
+    factor = 1
+    if target_side:
+        long_side = max(width, height)
+        factor = next((f for f in REDUCTION_FACTORS if long_side / f >= target_side), 1)
+
+    for f in REDUCTION_FACTORS[::-1]:
+        if f >= factor and (width / f) * (height / f) <= max_pixels:
+            return f
+    raise ImageTooLarge(
+        f"Image is {width}x{height}; more than {max_pixels} pixels even at 1/{REDUCTION_FACTORS[0]} scale"
+    )
+
+
+def _decode_with_pil(data: bytes, mode: str, factor: int) -> np.ndarray:
+    """Fallback for formats OpenCV can't read"""
+    with Image.open(io.BytesIO(data)) as img:
+        img = img.convert("L" if mode == "gray" else "RGB")
+        if factor > 1:
+            img = img.reduce(factor)
+        array = np.array(img)
+    if mode == "bgr":
+        array = cv2.cvtColor(array, cv2.COLOR_RGB2BGR)
+    return array
+
+
+def decode_image(
+    data: bytes,
+    mode: str = "bgr",
+    target_side: Optional[int] = None,
+    max_pixels: int = DEFAULT_MAX_PIXELS,
+    oversize: str = "downsample",
+) -> DecodedImage:
+    """
+    Decode encoded image bytes for one engine.
+
+    mode: "gray" (face recognition), "bgr" (YOLO/OpenCV) or "rgb".
+    target_side: smallest long side the engine needs; None keeps full resolution.
+    oversize: "downsample" reduces images over max_pixels, "reject" raises ImageTooLarge.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    if oversize not in OVERSIZE_POLICIES:
+        raise ValueError(f"oversize must be one of {OVERSIZE_POLICIES}")
+    if not data:
+        raise ValueError("Image payload is required")
+
+    try:
+        width, height = probe_size(data)
+    except ImageTooLarge:
+        raise
+    except Exception as exc:
+        raise ValueError(f"Unrecognised image data: {exc}") from exc
+
+    if oversize == "reject" and width * height > max_pixels:
+        raise ImageTooLarge(f"Image is {width}x{height}; the limit is {max_pixels} pixels")
+    factor = reduction_factor(width, height, target_side, max_pixels)
+
+    read_mode = "gray" if mode == "gray" else "bgr"
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    image = cv2.imdecode(buffer, _READ_FLAGS[read_mode][factor] | _IGNORE_ORIENTATION)
+    if image is None:
+        image = _decode_with_pil(data, read_mode, factor)
+    if mode == "rgb":
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    return DecodedImage(image=image, original_size=(width, height), factor=factor)
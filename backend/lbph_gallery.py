@@ -0,0 +1,298 @@
+"""
+Binary LBPH gallery for Vision Mate.
+Stores LBPH histograms and labels in a compact, memory-mappable file so the
+recognizer can cold-start without OpenCV's YAML parser. YAML stays available
+as an import/export format compatible with LBPHFaceRecognizer.read/save.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import struct
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+MAGIC = b"VMLBPH\x00\x00"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_HEADER_LEN = struct.Struct("<I")
+# Windows refuses to rename over or delete a file that any process has mapped,
+# so there every worker reads the gallery into memory instead
+CAN_REPLACE_MAPPED_FILES = os.name != "nt"
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class GalleryFormatError(ValueError):
+    """Raised when a gallery file is not a valid (or intact) binary model."""
+
+
+class LBPHGallery:
+    """
+    LBPH histograms + labels with OpenCV-identical feature extraction and
+    chi-square nearest-neighbour prediction.
+    """
+
+    def __init__(self,
+                 histograms: np.ndarray,
+                 labels: np.ndarray,
+                 radius: int = 1,
+                 neighbors: int = 8,
+                 grid_x: int = 8,
+                 grid_y: int = 8,
+                 model_version: Optional[int] = None):
+        self.histograms = histograms
+        self.labels = labels
+        self.radius = radius
+        self.neighbors = neighbors
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self.model_version = model_version
+
+    def __len__(self) -> int:
+        return int(self.labels.shape[0])
+
+    @property
+    def dim(self) -> int:
+        return self.grid_x * self.grid_y * (2 ** self.neighbors)
+
+    # Feature extraction (mirrors opencv_contrib face/lbph_faces.cpp)
+    def _elbp(self, src: np.ndarray) -> np.ndarray:
+        src = src.astype(np.float32)
+        r = self.radius
+        h, w = src.shape
+        center = src[r:h - r, r:w - r]
+        dst = np.zeros(center.shape, dtype=np.int32)
+        eps = np.finfo(np.float32).eps
+
+        for n in range(self.neighbors):
+            x = np.float32(r * math.cos(2.0 * math.pi * n / self.neighbors))
+            y = np.float32(-r * math.sin(2.0 * math.pi * n / self.neighbors))
+            fx, fy = int(math.floor(x)), int(math.floor(y))
+            cx, cy = int(math.ceil(x)), int(math.ceil(y))
+            tx, ty = np.float32(x - fx), np.float32(y - fy)
+            w1 = np.float32((1 - tx) * (1 - ty))
+            w2 = np.float32(tx * (1 - ty))
+            w3 = np.float32((1 - tx) * ty)
+            w4 = np.float32(tx * ty)
+
+            def shifted(dy: int, dx: int) -> np.ndarray:
+                return src[r + dy:h - r + dy, r + dx:w - r + dx]
+
+            t = (w1 * shifted(fy, fx) + w2 * shifted(fy, cx)
+                 + w3 * shifted(cy, fx) + w4 * shifted(cy, cx))
+            dst += ((t > center) | (np.abs(t - center) < eps)).astype(np.int32) << n
+
+        return dst
+
+    def histogram(self, face: np.ndarray) -> np.ndarray:
+        """Spatial LBP histogram of a grayscale face crop (1 x dim, float32)"""
+        lbp = self._elbp(face)
+        patterns = 2 ** self.neighbors
+        cell_h = lbp.shape[0] // self.grid_y
+        cell_w = lbp.shape[1] // self.grid_x
+
+        result = np.empty((self.grid_y * self.grid_x, patterns), dtype=np.float32)
+        k = 0
+        for i in range(self.grid_y):
+            for j in range(self.grid_x):
+                cell = lbp[i * cell_h:(i + 1) * cell_h, j * cell_w:(j + 1) * cell_w]
+                result[k] = np.bincount(cell.ravel(), minlength=patterns) / cell.size
+                k += 1
+        return result.reshape(1, -1)
+
+    def distances(self, query: np.ndarray) -> np.ndarray:
+        """Chi-square distance from a query histogram to every gallery entry"""
+        query = np.ascontiguousarray(query.reshape(-1), dtype=np.float32)
+        return np.array(
+            [cv2.compareHist(row, query, cv2.HISTCMP_CHISQR_ALT) for row in self.histograms],
+            dtype=np.float64,
+        )
+
+    def predict(self, face: np.ndarray) -> Tuple[int, float]:
+        """Nearest-neighbour label and distance, same semantics as LBPH predict()"""
+        if len(self) == 0:
+            return -1, float("inf")
+        dists = self.distances(self.histogram(face))
+        best = int(np.argmin(dists))
+        return int(self.labels[best]), float(dists[best])
+
+    # Construction
+    @classmethod
+    def from_recognizer(cls, recognizer: Any, model_version: Optional[int] = None) -> "LBPHGallery":
+        """Build from a trained cv2.face.LBPHFaceRecognizer"""
+        hists = recognizer.getHistograms()
+        histograms = (
+            np.vstack([h.reshape(1, -1) for h in hists]).astype(np.float32)
+            if len(hists) else np.empty((0, 0), dtype=np.float32)
+        )
+        return cls(
+            histograms=histograms,
+            labels=np.asarray(recognizer.getLabels(), dtype=np.int32).reshape(-1),
+            radius=recognizer.getRadius(),
+            neighbors=recognizer.getNeighbors(),
+            grid_x=recognizer.getGridX(),
+            grid_y=recognizer.getGridY(),
+            model_version=model_version,
+        )
+
+    # Binary format
+    def save(self, path: str) -> None:
+        """
+        Layout: MAGIC | u32 header length | JSON header | labels (int32) | histograms (float32),
+        array sections 64-byte aligned so they can be memory-mapped in place.
+        Written to a uniquely named temp file and renamed, so readers never see a
+        partial model and concurrent saves never write into the same file.
+        """
+        labels = np.ascontiguousarray(self.labels, dtype=np.int32)
+        histograms = np.ascontiguousarray(self.histograms, dtype=np.float32)
+        labels_bytes = labels.tobytes()
+        hist_bytes = histograms.tobytes()
+
+        digest = hashlib.sha256()
+        digest.update(labels_bytes)
+        digest.update(hist_bytes)
+
+        header: Dict[str, Any] = {
+            "format_version": FORMAT_VERSION,
+            "radius": self.radius,
+            "neighbors": self.neighbors,
+            "grid_x": self.grid_x,
+            "grid_y": self.grid_y,
+            "count": int(labels.shape[0]),
+            "dim": int(histograms.shape[1]) if histograms.ndim == 2 else 0,
+            "model_version": self.model_version,
+            "created_at": datetime.now().isoformat(),
+            "sha256": digest.hexdigest(),
+        }
+
+        # Offsets depend on the header length, which depends on the offsets;
+        # reserve a fixed-width field so one pass is enough.
+        header["labels_offset"] = 0
+        header["histograms_offset"] = 0
+        preamble = len(MAGIC) + _HEADER_LEN.size
+        header_len = len(json.dumps(header).encode("utf-8")) + 32
+        labels_offset = _align(preamble + header_len)
+        histograms_offset = _align(labels_offset + len(labels_bytes))
+        header["labels_offset"] = labels_offset
+        header["histograms_offset"] = histograms_offset
+        header_bytes = json.dumps(header).encode("utf-8").ljust(header_len, b" ")
+
+        path_obj = Path(path)
+        path_obj.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{path_obj.name}.", suffix=".tmp", dir=path_obj.parent)
+        try:
+            # mkstemp creates the file owner-only; keep the usual model file mode
+            os.chmod(tmp_path, 0o644)
+            with os.fdopen(fd, "wb") as f:
+                f.write(MAGIC)
+                f.write(_HEADER_LEN.pack(header_len))
+                f.write(header_bytes)
+                f.write(b"\x00" * (labels_offset - f.tell()))
+                f.write(labels_bytes)
+                f.write(b"\x00" * (histograms_offset - f.tell()))
+                f.write(hist_bytes)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path_obj)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    @staticmethod
+    def read_header(path: str) -> Dict[str, Any]:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise GalleryFormatError(f"{path} is not a Vision Mate LBPH gallery")
+            (header_len,) = _HEADER_LEN.unpack(f.read(_HEADER_LEN.size))
+            header = json.loads(f.read(header_len).decode("utf-8"))
+        if header.get("format_version") != FORMAT_VERSION:
+            raise GalleryFormatError(
+                f"Unsupported gallery format version {header.get('format_version')}"
+            )
+        return header
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, verify: bool = False) -> "LBPHGallery":
+        """
+        Load a binary gallery. With mmap=True histogram pages are read lazily
+        by the OS, so cold start cost does not grow with gallery size.
+        verify=True checks the payload checksum (reads the whole file).
+        On Windows the file is always read into memory (CAN_REPLACE_MAPPED_FILES),
+        so the next save can still replace it.
+        """
+        header = cls.read_header(path)
+        count, dim = int(header["count"]), int(header["dim"])
+
+        expected_size = header["histograms_offset"] + count * dim * 4
+        if os.path.getsize(path) < expected_size:
+            raise GalleryFormatError(f"{path} is truncated")
+
+        if mmap and count > 0 and CAN_REPLACE_MAPPED_FILES:
+            labels = np.memmap(path, dtype=np.int32, mode="r",
+                               offset=header["labels_offset"], shape=(count,))
+            histograms = np.memmap(path, dtype=np.float32, mode="r",
+                                   offset=header["histograms_offset"], shape=(count, dim))
+        else:
+            with open(path, "rb") as f:
+                f.seek(header["labels_offset"])
+                labels = np.frombuffer(f.read(count * 4), dtype=np.int32)
+                f.seek(header["histograms_offset"])
+                histograms = np.frombuffer(f.read(count * dim * 4), dtype=np.float32).reshape(count, dim)
+
+        if verify:
+            digest = hashlib.sha256()
+            digest.update(np.ascontiguousarray(labels).tobytes())
+            digest.update(np.ascontiguousarray(histograms).tobytes())
+            if digest.hexdigest() != header["sha256"]:
+                raise GalleryFormatError(f"{path} failed checksum verification")
+
+        return cls(
+            histograms=histograms,
+            labels=labels,
+            radius=header["radius"],
+            neighbors=header["neighbors"],
+            grid_x=header["grid_x"],
+            grid_y=header["grid_y"],
+            model_version=header.get("model_version"),
+        )
+
+    # OpenCV YAML interop
+    @classmethod
+    def import_yaml(cls, path: str, model_version: Optional[int] = None) -> "LBPHGallery":
+        """Read a model written by LBPHFaceRecognizer.save()"""
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.read(str(path))
+        return cls.from_recognizer(recognizer, model_version=model_version)
+
+    def export_yaml(self, path: str) -> None:
+        """Write a model that LBPHFaceRecognizer.read() can load"""
+        fs = cv2.FileStorage(str(path), cv2.FILE_STORAGE_WRITE)
+        try:
+            fs.startWriteStruct("opencv_lbphfaces", cv2.FileNode_MAP)
+            fs.write("threshold", float(np.finfo(np.float64).max))
+            fs.write("radius", int(self.radius))
+            fs.write("neighbors", int(self.neighbors))
+            fs.write("grid_x", int(self.grid_x))
+            fs.write("grid_y", int(self.grid_y))
+            fs.startWriteStruct("histograms", cv2.FileNode_SEQ)
+            for row in self.histograms:
+                fs.write("", np.asarray(row, dtype=np.float32).reshape(1, -1))
+            fs.endWriteStruct()
+            fs.write("labels", np.asarray(self.labels, dtype=np.int32).reshape(-1, 1))
+            fs.startWriteStruct("labelsInfo", cv2.FileNode_SEQ)
+            fs.endWriteStruct()
+            fs.endWriteStruct()
+        finally:
+            fs.release()
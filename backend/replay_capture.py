@@ -0,0 +1,261 @@
+"""
+Replay a Vision Mate traffic capture against a local server.
+Each captured session (recognize socket, relay uploads, relay polls) is
+replayed on its own connection with the original inter-frame timing
+(optionally sped up), and the run reports latency percentiles, dropped
+frames (shed, failed or unanswered) and CPU time.
+
+Usage:
+  VISIONMATE_CAPTURE_DIR=captures python face_recognition_api.py   # record
+  python replay_capture.py captures/capture-20261019-101500-4242.vmcap --speed 2 --server-pid 4242
+"""
+
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from benchmark_navigation import percentile
+from session_capture import CaptureRecord, read_capture
+
+
+@dataclass
+class ChannelStats:
+    frames: int = 0
+    answered: int = 0
+    shed: int = 0
+    failed: int = 0
+    unanswered: int = 0
+    latencies_ms: List[float] = field(default_factory=list)
+    send_lag_ms: List[float] = field(default_factory=list)
+
+    def merge(self, other: "ChannelStats") -> None:
+        self.frames += other.frames
+        self.answered += other.answered
+        self.shed += other.shed
+        self.failed += other.failed
+        self.unanswered += other.unanswered
+        self.latencies_ms.extend(other.latencies_ms)
+        self.send_lag_ms.extend(other.send_lag_ms)
+
+    def summary(self) -> Dict:
+        latencies = self.latencies_ms
+        return {
+            "frames": self.frames,
+            "answered": self.answered,
+            "dropped": self.shed + self.failed + self.unanswered,
+            "shed": self.shed,
+            "failed": self.failed,
+            "unanswered": self.unanswered,
+            "latency_ms": {
+                "avg": round(statistics.mean(latencies), 2) if latencies else 0.0,
+                "p50": round(percentile(latencies, 50), 2),
+                "p95": round(percentile(latencies, 95), 2),
+                "p99": round(percentile(latencies, 99), 2),
+                "max": round(max(latencies), 2) if latencies else 0.0,
+            },
+            # How far behind schedule frames went out (client-side backpressure)
+            "send_lag_p95_ms": round(percentile(self.send_lag_ms, 95), 2),
+        }
+
+
+def load_sessions(path: Path) -> Tuple[Dict[Tuple[str, str], List[CaptureRecord]], float]:
+    """Records grouped by (channel, session), plus the capture's duration in seconds"""
+    _started_at, records = read_capture(path)
+    sessions: Dict[Tuple[str, str], List[CaptureRecord]] = {}
+    duration = 0.0
+    for record in records:
+        sessions.setdefault((record.channel, record.session), []).append(record)
+        duration = max(duration, record.offset)
+    return sessions, duration
+
+
+def process_cpu_seconds(pid: int) -> float:
+    """User + system CPU time of a process, from /proc (Linux only)"""
+    fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    # utime and stime are fields 14 and 15 of stat; fields[0] here is field 3
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _wait_until(deadline: float) -> float:
+    """Sleep until deadline (perf_counter); returns how late we are in ms"""
+    delay = deadline - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+    return max(0.0, (time.perf_counter() - deadline) * 1000)
+
+
+def replay_recognize_session(
+    ws_url: str, records: List[CaptureRecord], t0: float, speed: float, timeout: float
+) -> ChannelStats:
+    """One /ws/recognize connection: a sender thread keeps the captured pacing while replies are timed here"""
+    from websockets.sync.client import connect
+
+    stats = ChannelStats(frames=len(records))
+    first_offset = records[0].offset
+    _wait_until(t0 + first_offset / speed)
+    sent_at: List[float] = []
+
+    with connect(ws_url, max_size=None) as ws:
+        def sender() -> None:
+            for record in records:
+                stats.send_lag_ms.append(_wait_until(t0 + record.offset / speed))
+                sent_at.append(time.perf_counter())
+                ws.send(json.dumps({"image": record.image_b64()}))
+
+        thread = threading.Thread(target=sender, daemon=True)
+        thread.start()
+        for index in range(len(records)):
+            try:
+                reply = json.loads(ws.recv(timeout=timeout))
+            except TimeoutError:
+                stats.unanswered = len(records) - index
+                break
+            stats.latencies_ms.append((time.perf_counter() - sent_at[index]) * 1000)
+            if reply.get("success"):
+                stats.answered += 1
+            elif "retry_after" in reply:
+                stats.shed += 1
+            else:
+                stats.failed += 1
+        thread.join(timeout)
+
+    return stats
+
+
+def _replay_http_session(
+    records: List[CaptureRecord],
+    t0: float,
+    speed: float,
+    send: Callable[[requests.Session, CaptureRecord], requests.Response],
+) -> ChannelStats:
+    """Sequential requests at the captured pacing, as from a single client"""
+    stats = ChannelStats(frames=len(records))
+    with requests.Session() as http:
+        for record in records:
+            stats.send_lag_ms.append(_wait_until(t0 + record.offset / speed))
+            start = time.perf_counter()
+            try:
+                response = send(http, record)
+            except requests.RequestException:
+                stats.unanswered += 1
+                continue
+            stats.latencies_ms.append((time.perf_counter() - start) * 1000)
+            if response.status_code == 200:
+                stats.answered += 1
+            elif response.status_code in (429, 503):
+                stats.shed += 1
+            else:
+                stats.failed += 1
+    return stats
+
+
+def replay_relay_session(
+    api_url: str, session: str, records: List[CaptureRecord], t0: float, speed: float, timeout: float
+) -> ChannelStats:
+    """One phone posting relay frames"""
+    endpoint = f"{api_url}/mobile-stream/{session}/frame"
+    return _replay_http_session(
+        records, t0, speed,
+        lambda http, record: http.post(endpoint, json={"image": record.image_b64()}, timeout=timeout),
+    )
+
+
+def replay_poll_session(
+    api_url: str, session: str, records: List[CaptureRecord], t0: float, speed: float, timeout: float
+) -> ChannelStats:
+    """One viewer polling for the latest relay frame; "no frame yet" still counts as answered"""
+    endpoint = f"{api_url}/mobile-stream/{session}/latest"
+    return _replay_http_session(records, t0, speed, lambda http, record: http.get(endpoint, timeout=timeout))
+
+
+def replay(
+    path: Path,
+    api_url: str = "http://localhost:8000",
+    speed: float = 1.0,
+    server_pids: Optional[List[int]] = None,
+    timeout: float = 30.0,
+) -> Dict:
+    if speed <= 0:
+        raise ValueError("speed must be positive")
+    api_url = api_url.rstrip("/")
+    ws_url = "ws" + api_url[len("http"):] + "/ws/recognize"
+    sessions, duration = load_sessions(path)
+    if not sessions:
+        raise ValueError(f"{path} contains no frames")
+
+    results: Dict[str, ChannelStats] = {}
+    lock = threading.Lock()
+
+    def run(key: Tuple[str, str], records: List[CaptureRecord], t0: float) -> None:
+        channel, session = key
+        try:
+            if channel == "recognize":
+                stats = replay_recognize_session(ws_url, records, t0, speed, timeout)
+            elif channel == "poll":
+                stats = replay_poll_session(api_url, session, records, t0, speed, timeout)
+            else:
+                stats = replay_relay_session(api_url, session, records, t0, speed, timeout)
+        except Exception as exc:
+            print(f"❌ Session {channel}/{session} failed: {exc}")
+            stats = ChannelStats(frames=len(records), unanswered=len(records))
+        with lock:
+            results.setdefault(channel, ChannelStats()).merge(stats)
+
+    server_pids = server_pids or []
+    server_cpu_start = sum(process_cpu_seconds(pid) for pid in server_pids)
+    client_cpu_start = time.process_time()
+    # Small head start so every session thread is waiting before the first frame is due
+    t0 = time.perf_counter() + 0.5
+    threads = [
+        threading.Thread(target=run, args=(key, records, t0), daemon=True)
+        for key, records in sessions.items()
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - t0
+
+    report = {
+        "capture": str(path),
+        "speed": speed,
+        "sessions": len(sessions),
+        "captured_duration_s": round(duration, 2),
+        "replay_duration_s": round(wall, 2),
+        "channels": {channel: stats.summary() for channel, stats in sorted(results.items())},
+        "cpu": {"client_s": round(time.process_time() - client_cpu_start, 2)},
+    }
+    if server_pids:
+        server_cpu = sum(process_cpu_seconds(pid) for pid in server_pids) - server_cpu_start
+        report["cpu"]["server_s"] = round(server_cpu, 2)
+        report["cpu"]["server_percent"] = round(100 * server_cpu / wall, 1) if wall > 0 else 0.0
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay a captured session against a local Vision Mate server")
+    parser.add_argument("capture", help="Capture file written with VISIONMATE_CAPTURE_DIR")
+    parser.add_argument("--api-url", default="http://localhost:8000")
+    parser.add_argument("--speed", type=float, default=1.0, help="Pacing multiplier (2 = twice as fast)")
+    parser.add_argument("--server-pid", type=int, action="append", default=[],
+                        help="Server process to measure CPU for (repeat for each worker)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait for a reply")
+    parser.add_argument("--output", default=None, help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    report = replay(Path(args.capture), args.api_url, args.speed, args.server_pid, args.timeout)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Traffic capture for Vision Mate.
+Records incoming /ws/recognize and mobile relay frames, and the viewer's
+relay polls, with their arrival times to a compact binary file (JPEG bytes,
+not base64), so real session shapes - bursts, idle gaps, several concurrent
+sessions - can be replayed against a local server with replay_capture.py.
+
+File layout (little-endian):
+  header  MAGIC, uint16 version, float64 wall-clock start (epoch seconds)
+  record  float64 offset (s since start), uint8 channel, uint8 flags,
+          uint16 session length, uint32 payload length, session, payload
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import os
+import struct
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+
+MAGIC = b"VMCAP\x00"
+VERSION = 1
+# "poll" records GET /mobile-stream/{id}/latest with an empty payload
+CHANNELS = {"recognize": 0, "relay": 1, "poll": 2}
+CHANNEL_NAMES = {code: name for name, code in CHANNELS.items()}
+
+# Payload could not be base64-decoded and is stored as the original text
+FLAG_RAW_TEXT = 0x01
+
+_HEADER = struct.Struct("<6sHd")
+_RECORD = struct.Struct("<dBBHI")
+
+
+class CaptureFormatError(ValueError):
+    """File is not a capture, or is from an unsupported version."""
+
+
+@dataclass
+class CaptureRecord:
+    offset: float       # seconds since the capture started
+    channel: str
+    session: str
+    payload: bytes
+    flags: int = 0
+
+    def image_b64(self) -> str:
+        """Payload as the client originally sent it (minus any data: URL prefix)"""
+        if self.flags & FLAG_RAW_TEXT:
+            return self.payload.decode("utf-8", errors="replace")
+        return base64.b64encode(self.payload).decode("ascii")
+
+
+def _encode_payload(image_b64: str) -> Tuple[bytes, int]:
+    data = image_b64.split(",", 1)[1] if "," in image_b64 else image_b64
+    try:
+        return base64.b64decode(data, validate=True), 0
+    except (binascii.Error, ValueError):
+        return image_b64.encode("utf-8"), FLAG_RAW_TEXT
+
+
+class CaptureWriter:
+    """Appends frames to one capture file; safe to share between threads."""
+
+    def __init__(self, path: Path, max_bytes: Optional[int] = None) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.frames = 0
+        self._lock = Lock()
+        self._file: Optional[BinaryIO] = open(self.path, "wb")
+        self._start = time.monotonic()
+        self._file.write(_HEADER.pack(MAGIC, VERSION, time.time()))
+        self._size = _HEADER.size
+
+    @classmethod
+    def from_env(cls) -> Optional["CaptureWriter"]:
+        """Enabled by VISIONMATE_CAPTURE_DIR; one file per process so workers don't interleave"""
+        directory = os.getenv("VISIONMATE_CAPTURE_DIR")
+        if not directory:
+            return None
+        max_mb = float(os.getenv("VISIONMATE_CAPTURE_MAX_MB", "512"))
+        name = f"capture-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.vmcap"
+        writer = cls(Path(directory) / name, max_bytes=int(max_mb * 1024 * 1024))
+        print(f"🎥 Capturing frames to {writer.path}")
+        return writer
+
+    @property
+    def active(self) -> bool:
+        return self._file is not None
+
+    def record(self, channel: str, session: str, image_b64: str, arrived_at: Optional[float] = None) -> None:
+        """arrived_at (time.monotonic()) lets callers record off the request path without skewing timing"""
+        offset = (arrived_at if arrived_at is not None else time.monotonic()) - self._start
+        payload, flags = _encode_payload(image_b64 if isinstance(image_b64, str) else "")
+        session_bytes = session.encode("utf-8")[:0xFFFF]
+        record = _RECORD.pack(offset, CHANNELS[channel], flags, len(session_bytes), len(payload))
+
+        with self._lock:
+            if self._file is None:
+                return
+            size = len(record) + len(session_bytes) + len(payload)
+            if self.max_bytes is not None and self._size + size > self.max_bytes:
+                print(f"🎥 Capture limit reached, stopped after {self.frames} frames")
+                self._close_locked()
+                return
+            self._file.write(record)
+            self._file.write(session_bytes)
+            self._file.write(payload)
+            self._size += size
+            self.frames += 1
+
+    def _close_locked(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_locked()
+
+
+def read_capture(path: Path) -> Tuple[float, Iterator[CaptureRecord]]:
+    """
+    (wall-clock start, records in write order); records from one session are in
+    arrival order. A truncated final record is ignored.
+    """
+    handle = open(path, "rb")
+    header = handle.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        handle.close()
+        raise CaptureFormatError(f"{path} is too short to be a capture")
+    magic, version, started_at = _HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        handle.close()
+        raise CaptureFormatError(f"{path} is not a version {VERSION} capture")
+
+    def records() -> Iterator[CaptureRecord]:
+        with handle:
+            while True:
+                head = handle.read(_RECORD.size)
+                if len(head) < _RECORD.size:
+                    return
+                offset, channel, flags, session_len, payload_len = _RECORD.unpack(head)
+                session = handle.read(session_len)
+                payload = handle.read(payload_len)
+                if len(payload) < payload_len:
+                    return
+                yield CaptureRecord(
+                    offset=offset,
+                    channel=CHANNEL_NAMES.get(channel, str(channel)),
+                    session=session.decode("utf-8", errors="replace"),
+                    payload=payload,
+                    flags=flags,
+                )
+
+    return started_at, records()
@@ -5,8 +5,10 @@ Clean implementation - no external dependencies beyond opencv-contrib-python
 """
 
 import os
-import json
 import shutil
+import threading
+import time
+import uuid
 import cv2
 import numpy as np
 from pathlib import Path
@@ -14,6 +16,10 @@ from typing import Optional, Tuple, List, Dict
 from dataclasses import dataclass
 from datetime import datetime
 
+from gallery_condensation import DEFAULT_MIN_DISTANCE, condense
+from lbph_gallery import LBPHGallery
+from user_catalog import UserCatalog
+
 
 @dataclass
 class RecognitionResult:
@@ -23,6 +29,21 @@ class RecognitionResult:
     confidence: float
     face_location: Optional[Tuple[int, int, int, int]]  # (top, right, bottom, left)
     is_known: bool
+    
+    def to_dict(self) -> Dict:
+        """JSON-serializable dict matching the frontend interface"""
+        face_loc = None
+        if self.face_location:
+            top, right, bottom, left = (int(v) for v in self.face_location)
+            face_loc = {"top": top, "right": right, "bottom": bottom, "left": left}
+        
+        return {
+            "user_id": int(self.user_id) if self.user_id is not None else None,
+            "user_name": str(self.user_name) if self.user_name else "Unknown",
+            "confidence": float(self.confidence),
+            "is_known": bool(self.is_known),
+            "face_location": face_loc
+        }
 
 
 class SimpleFaceRecognizer:
@@ -32,55 +53,119 @@ class SimpleFaceRecognizer:
     
     def __init__(self, 
                  dataset_path: str = "dataset",
-                 model_path: str = "face_model.yml",
+                 model_path: str = "face_model.lbph",
                  user_mapping_path: str = "user_mapping.json",
-                 confidence_threshold: float = 80.0):
+                 confidence_threshold: float = 80.0,
+                 catalog_path: str = "user_catalog.db",
+                 legacy_model_path: Optional[str] = "face_model.yml",
+                 autoload: bool = True,
+                 reload_interval: float = 1.0,
+                 condense_gallery: bool = True,
+                 duplicate_distance: float = DEFAULT_MIN_DISTANCE,
+                 condense_candidate_factor: int = 4):
         
         self.dataset_path = Path(dataset_path)
         self.model_path = Path(model_path)
+        self.legacy_model_path = Path(legacy_model_path) if legacy_model_path else None
         self.user_mapping_path = Path(user_mapping_path)
         self.confidence_threshold = confidence_threshold
+        self.catalog_path = catalog_path
+        self.catalog: Optional[UserCatalog] = None
+        self.cascade_path: Optional[str] = None
+        self._local = threading.local()
         
-        # Face detector
-        cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        self.face_cascade = cv2.CascadeClassifier(cascade_path)
+        # Face recognizer - LBPH parameters; histograms are computed by
+        # LBPHGallery (OpenCV-identical) and served from a memory-mapped file
+        self.lbph_params = {'radius': 1, 'neighbors': 8, 'grid_x': 8, 'grid_y': 8}
+        self.gallery: Optional[LBPHGallery] = None
         
-        # Face recognizer - LBPH
-        self.recognizer = cv2.face.LBPHFaceRecognizer_create(
-            radius=1,
-            neighbors=8,
-            grid_x=8,
-            grid_y=8
-        )
+        # Gallery condensation: drop near-duplicate crops before they cost a
+        # comparison on every predict
+        self.condense_gallery = condense_gallery
+        self.duplicate_distance = duplicate_distance
+        self.condense_candidate_factor = condense_candidate_factor
+        
+        # Hot reload: other processes may retrain and replace model_path
+        self.reload_interval = reload_interval
+        self._model_signature: Optional[Tuple[int, int, int]] = None
+        self._last_reload_check = 0.0
         
         self.user_names: Dict[int, str] = {}
         self.is_trained = False
+        self.is_loaded = False
+        
+        if autoload:
+            self.load()
+    
+    def load(self):
+        """Load cascade, catalog and model (deferred when autoload=False)"""
+        if self.is_loaded:
+            return
+        
+        # Face detector (one classifier per thread, created on first use)
+        self.cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
         
+        self.catalog = UserCatalog(self.catalog_path)
         self._load_user_mapping()
         self._load_model()
+        self.is_loaded = True
     
     def _load_user_mapping(self):
-        """Load user ID to name mapping"""
-        if self.user_mapping_path.exists():
-            with open(self.user_mapping_path, 'r', encoding='utf-8') as f:
-                mapping = json.load(f)
-                self.user_names = {int(k): v for k, v in mapping.items()}
+        """Load user ID to name mapping from the catalog (importing legacy JSON once)"""
+        if self.catalog.migrate_legacy(self.user_mapping_path, self.dataset_path):
+            print(f"📦 Migrated {self.user_mapping_path} and {self.dataset_path}/ into {self.catalog.db_path}")
+        self.user_names = self.catalog.get_user_names()
+        if self.user_names:
             print(f"✅ Loaded {len(self.user_names)} users: {self.user_names}")
     
-    def _save_user_mapping(self):
-        """Save user mapping"""
-        with open(self.user_mapping_path, 'w', encoding='utf-8') as f:
-            json.dump({str(k): v for k, v in self.user_names.items()}, f, indent=2)
+    def _model_file_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = self.model_path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
     
     def _load_model(self):
-        """Load trained model if exists"""
+        """Load trained model if exists (binary gallery, else one-time YAML import)"""
         if self.model_path.exists():
             try:
-                self.recognizer.read(str(self.model_path))
+                self._model_signature = self._model_file_signature()
+                self.gallery = LBPHGallery.load(str(self.model_path), mmap=True)
                 self.is_trained = True
-                print(f"✅ Loaded model from {self.model_path}")
+                print(f"✅ Loaded model from {self.model_path} ({len(self.gallery)} samples)")
             except Exception as e:
                 print(f"⚠️ Could not load model: {e}")
+        elif self.legacy_model_path and self.legacy_model_path.exists():
+            try:
+                self.import_yaml(str(self.legacy_model_path))
+                print(f"📦 Converted {self.legacy_model_path} to {self.model_path}")
+            except Exception as e:
+                print(f"⚠️ Could not import legacy model: {e}")
+    
+    def import_yaml(self, yaml_path: str) -> None:
+        """Replace the current model with one saved by LBPHFaceRecognizer.save()"""
+        gallery = LBPHGallery.import_yaml(yaml_path)
+        gallery.save(str(self.model_path))
+        self._model_signature = self._model_file_signature()
+        self.gallery = LBPHGallery.load(str(self.model_path), mmap=True)
+        self.is_trained = len(self.gallery) > 0
+    
+    def export_yaml(self, yaml_path: str) -> None:
+        """Export the current model in OpenCV's LBPH YAML format"""
+        if self.gallery is None:
+            raise RuntimeError("No trained model to export")
+        self.gallery.export_yaml(yaml_path)
+    
+    @property
+    def face_cascade(self) -> cv2.CascadeClassifier:
+        """
+        This thread's Haar cascade. CascadeClassifier keeps per-image state in
+        its feature evaluator, so API threadpool and enrollment threads must not share one.
+        """
+        cascade = getattr(self._local, "face_cascade", None)
+        if cascade is None:
+            cascade = self._local.face_cascade = cv2.CascadeClassifier(self.cascade_path)
+        return cascade
     
     def _to_gray(self, image: np.ndarray) -> np.ndarray:
         """Convert to grayscale if needed"""
@@ -95,69 +180,141 @@ class SimpleFaceRecognizer:
         )
         return [(y, x + w, y + h, x) for (x, y, w, h) in faces]
     
-    def train(self, max_per_user: int = 100) -> Dict[str, int]:
-        """Train on dataset"""
-        faces = []
+    def feature_extractor(self) -> LBPHGallery:
+        return LBPHGallery(np.empty((0, 0), np.float32), np.empty(0, np.int32), **self.lbph_params)
+    
+    def sample_histograms(self, max_per_user: Optional[int] = None,
+                          spread: bool = False) -> Tuple[Dict[int, List[Tuple[int, np.ndarray]]], int]:
+        """LBPH histograms of catalog samples as {user_id: [(sample_id, histogram)]}, plus failure count"""
+        extractor = self.feature_extractor()
+        by_user: Dict[int, List[Tuple[int, np.ndarray]]] = {}
+        failed = 0
+        
+        for sample in self.catalog.list_samples(max_per_user=max_per_user, spread=spread):
+            try:
+                img = cv2.imread(str(self.dataset_path / sample.path), cv2.IMREAD_GRAYSCALE)
+                if img is None:
+                    failed += 1
+                    continue
+                
+                # Resize to consistent size
+                resized = cv2.resize(img, (200, 200))
+                by_user.setdefault(sample.user_id, []).append((sample.id, extractor.histogram(resized)))
+            except:
+                failed += 1
+        
+        return by_user, failed
+    
+    def train(self, max_per_user: int = 100, import_dataset: bool = False) -> Dict[str, int]:
+        """
+        Train on the catalog's samples, keeping a diverse subset of each user's.
+        import_dataset=True first adds images copied straight into dataset/userN/
+        (a folder walk, so it is opt-in rather than part of every retrain).
+        """
+        histograms = []
         labels = []
-        stats = {'processed': 0, 'failed': 0, 'users': 0}
+        sample_ids = []
+        stats = {'processed': 0, 'failed': 0, 'users': 0, 'pruned': 0}
         
-        if not self.dataset_path.exists():
-            print(f"❌ Dataset not found: {self.dataset_path}")
+        if import_dataset:
+            imported = self.catalog.import_dataset(self.dataset_path)
+            if imported:
+                print(f"📥 Imported {imported} new image(s) from {self.dataset_path}")
+                self.user_names = self.catalog.get_user_names()
+        
+        if self.catalog.count_samples() == 0:
+            print(f"❌ No enrollment samples in catalog: {self.catalog.db_path}")
             return stats
         
         print("\n🚀 Training face recognition model...")
         
-        for user_folder in sorted(self.dataset_path.iterdir()):
-            if not user_folder.is_dir():
-                continue
-            
-            # Extract user ID
-            try:
-                user_id = int(''.join(filter(str.isdigit, user_folder.name)))
-            except ValueError:
-                continue
+        # Condensation looks at more candidates than it keeps, so it can choose
+        # diverse crops; candidates span the user's whole history, newest included,
+        # so crops enrolled after the first few hundred still get a chance
+        if self.condense_gallery:
+            samples_by_user, stats['failed'] = self.sample_histograms(
+                max_per_user=max_per_user * self.condense_candidate_factor, spread=True)
+        else:
+            samples_by_user, stats['failed'] = self.sample_histograms(max_per_user=max_per_user)
+        
+        for user_id, entries in samples_by_user.items():
+            if self.condense_gallery:
+                keep = condense(np.vstack([h for _, h in entries]), max_per_user, self.duplicate_distance)
+            else:
+                keep = list(range(min(len(entries), max_per_user)))
             
             user_name = self.user_names.get(user_id, f"User{user_id}")
-            images = list(user_folder.glob("*.jpg"))[:max_per_user]
+            print(f"   📸 {user_name}: {len(keep)} of {len(entries)} images")
             
-            print(f"   📸 {user_name}: {len(images)} images")
+            for i in keep:
+                sample_id, histogram = entries[i]
+                histograms.append(histogram)
+                labels.append(user_id)
+                sample_ids.append(sample_id)
             
-            count = 0
-            for img_path in images:
-                try:
-                    img = cv2.imread(str(img_path), cv2.IMREAD_GRAYSCALE)
-                    if img is None:
-                        continue
-                    
-                    # Resize to consistent size
-                    resized = cv2.resize(img, (200, 200))
-                    faces.append(resized)
-                    labels.append(user_id)
-                    count += 1
-                    stats['processed'] += 1
-                except:
-                    stats['failed'] += 1
-            
-            if count > 0:
+            stats['processed'] += len(keep)
+            stats['pruned'] += len(entries) - len(keep)
+            if keep:
                 stats['users'] += 1
         
-        if len(faces) < 2:
+        if len(histograms) < 2:
             print("❌ Need at least 2 face samples")
             return stats
         
         # Train
-        self.recognizer.train(faces, np.array(labels))
-        self.recognizer.save(str(self.model_path))
+        version = self.catalog.record_model_version(str(self.model_path), sample_ids)
+        LBPHGallery(
+            histograms=np.vstack(histograms),
+            labels=np.array(labels, dtype=np.int32),
+            model_version=version,
+            **self.lbph_params,
+        ).save(str(self.model_path))
+        # Serve from the mapped file so every worker shares the same page cache
+        self._model_signature = self._model_file_signature()
+        self.gallery = LBPHGallery.load(str(self.model_path), mmap=True)
         self.is_trained = True
         
-        print(f"\n✅ Training done! {stats['processed']} faces, {stats['users']} users")
+        print(f"\n✅ Training done! {stats['processed']} faces, {stats['users']} users, "
+              f"{stats['pruned']} near-duplicates pruned")
         return stats
     
+    def refresh_if_stale(self, force: bool = False) -> bool:
+        """
+        Pick up a model written by another process (e.g. /train in another worker).
+        Saves are atomic renames, so a changed inode/size/mtime means a new version;
+        the mmap keeps the old file alive until the swap. Returns True on reload.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_reload_check < self.reload_interval:
+            return False
+        self._last_reload_check = now
+        
+        signature = self._model_file_signature()
+        if signature == self._model_signature:
+            return False
+        
+        self._model_signature = signature
+        self.user_names = self.catalog.get_user_names()
+        if signature is None:
+            self.gallery = None
+            self.is_trained = False
+            print("🔄 Model removed by another process")
+            return True
+        
+        try:
+            self.gallery = LBPHGallery.load(str(self.model_path), mmap=True)
+            self.is_trained = len(self.gallery) > 0
+            print(f"🔄 Reloaded model version {self.gallery.model_version} ({len(self.gallery)} samples)")
+        except Exception as e:
+            print(f"⚠️ Could not reload model: {e}")
+        return True
+    
     def recognize(self, image: np.ndarray) -> List[RecognitionResult]:
         """Recognize faces in image"""
         results = []
         
-        if not self.is_trained:
+        self.refresh_if_stale()
+        if not self.is_trained or self.gallery is None:
             return results
         
         gray = self._to_gray(image)
@@ -171,7 +328,7 @@ class SimpleFaceRecognizer:
             face = cv2.resize(face, (200, 200))
             
             try:
-                user_id, confidence = self.recognizer.predict(face)
+                user_id, confidence = self.gallery.predict(face)
                 
                 # Lower confidence = better match
                 if confidence <= self.confidence_threshold:
@@ -201,47 +358,137 @@ class SimpleFaceRecognizer:
         
         return results
     
-    def add_face(self, image: np.ndarray, user_id: int, user_name: str) -> bool:
-        """Add new face and retrain"""
+    def _crop_first_face(self, image: np.ndarray) -> Optional[np.ndarray]:
         gray = self._to_gray(image)
         faces = self._detect_faces(gray)
         
         if not faces:
-            return False
+            return None
         
         top, right, bottom, left = faces[0]
-        face = gray[top:bottom, left:right]
+        return gray[top:bottom, left:right]
+    
+    def crop_enrollment_face(self, image: np.ndarray) -> Tuple[Optional[np.ndarray], str]:
+        """Stricter crop for batch enrollment: exactly one face, else a reject reason"""
+        gray = self._to_gray(image)
+        faces = self._detect_faces(gray)
+        
+        if not faces:
+            return None, "no_face"
+        if len(faces) > 1:
+            return None, "multiple_faces"
         
-        # Save to dataset
+        top, right, bottom, left = faces[0]
+        return gray[top:bottom, left:right], "accepted"
+    
+    def _write_sample(self, face: np.ndarray, user_id: int, user_name: str) -> str:
+        """Write a face crop under dataset/userN/ and return its dataset-relative path"""
         user_folder = self.dataset_path / f"user{user_id}"
-        user_folder.mkdir(exist_ok=True)
+        user_folder.mkdir(parents=True, exist_ok=True)
         
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        cv2.imwrite(str(user_folder / f"{user_name}_{ts}.jpg"), face)
+        # The clock can tick coarsely (~15 ms on Windows), so a random suffix
+        # keeps crops written back-to-back from sharing a name
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        img_path = user_folder / f"{user_name}_{ts}_{uuid.uuid4().hex[:8]}.jpg"
+        if not cv2.imwrite(str(img_path), face):
+            raise IOError(f"Could not write face sample {img_path}")
+        
+        return img_path.relative_to(self.dataset_path).as_posix()
+    
+    def _discard_samples(self, paths: List[str]) -> None:
+        for rel_path in paths:
+            (self.dataset_path / rel_path).unlink(missing_ok=True)
+    
+    def _store_samples(self, faces: List[np.ndarray], user_id: int, user_name: str,
+                       qualities: Optional[List[float]] = None) -> List[int]:
+        """
+        Write face crops and record them in one catalog transaction; if anything
+        fails, the files already written are removed so no partial batch is left.
+        """
+        paths: List[str] = []
+        try:
+            for face in faces:
+                paths.append(self._write_sample(face, user_id, user_name))
+            return self.catalog.add_samples(user_id, paths, qualities)
+        except Exception:
+            self._discard_samples(paths)
+            raise
+    
+    def _store_sample(self, face: np.ndarray, user_id: int, user_name: str) -> int:
+        """Write a face crop and record it in the catalog"""
+        return self._store_samples([face], user_id, user_name)[0]
+    
+    def _create_user_with_samples(self, faces: List[np.ndarray], user_name: str,
+                                  qualities: Optional[List[float]] = None) -> int:
+        user_id = self.catalog.create_user(user_name)
+        try:
+            self._store_samples(faces, user_id, user_name, qualities)
+        except Exception:
+            # Don't leave an empty user behind
+            self.catalog.delete_user(user_id)
+            raise
+        return user_id
+    
+    def enroll_faces(self, faces: List[np.ndarray], user_name: str, user_id: Optional[int] = None,
+                     qualities: Optional[List[float]] = None) -> int:
+        """
+        Store pre-cropped faces for a new (user_id=None) or existing user without
+        retraining, so a batch can finish with a single train(). qualities (e.g.
+        sharpness) are recorded per sample. An existing user keeps its name; an
+        unknown user_id raises ValueError. Returns the user ID.
+        """
+        if user_id is None:
+            user_id = self._create_user_with_samples(faces, user_name, qualities)
+        else:
+            stored_name = self.catalog.get_user_name(user_id)
+            if stored_name is None:
+                raise ValueError(f"User {user_id} not found")
+            user_name = stored_name
+            self._store_samples(faces, user_id, user_name, qualities)
+        self.user_names[user_id] = user_name
+        return user_id
+    
+    def add_face(self, image: np.ndarray, user_id: int, user_name: str) -> bool:
+        """Add new face and retrain"""
+        face = self._crop_first_face(image)
+        if face is None:
+            return False
         
-        # Update mapping
+        self.catalog.ensure_user(user_id, user_name)
         self.user_names[user_id] = user_name
-        self._save_user_mapping()
+        self._store_sample(face, user_id, user_name)
         
         # Retrain
         self.train()
         return True
     
+    def register_user(self, image: np.ndarray, user_name: str) -> Optional[int]:
+        """Create a new user from one image; returns the allocated ID or None if no face"""
+        face = self._crop_first_face(image)
+        if face is None:
+            return None
+        
+        # ID allocation happens inside a catalog transaction, so concurrent
+        # registrations can never be handed the same ID.
+        user_id = self._create_user_with_samples([face], user_name)
+        self.user_names[user_id] = user_name
+        
+        self.train()
+        return user_id
+    
     def get_next_user_id(self) -> int:
-        if not self.user_names:
-            return 1
-        return max(self.user_names.keys()) + 1
+        return self.catalog.next_user_id()
     
     def list_users(self) -> Dict[int, str]:
+        # The catalog is shared across workers; read it rather than a local cache
+        self.user_names = self.catalog.get_user_names()
         return self.user_names.copy()
 
     def remove_user(self, user_id: int) -> bool:
         """Remove a registered user, dataset samples, and refresh model state."""
-        if user_id not in self.user_names:
+        if not self.catalog.delete_user(user_id):
             return False
-
-        self.user_names.pop(user_id, None)
-        self._save_user_mapping()
+        self.user_names = self.catalog.get_user_names()
 
         user_folder = self.dataset_path / f"user{user_id}"
         if user_folder.exists() and user_folder.is_dir():
@@ -250,8 +497,10 @@ class SimpleFaceRecognizer:
         # If there are no users left, clear model state.
         if not self.user_names:
             self.is_trained = False
+            self.gallery = None
             if self.model_path.exists():
                 self.model_path.unlink(missing_ok=True)
+            self._model_signature = None
             return True
 
         # Re-train from remaining user data.
@@ -264,6 +513,6 @@ if __name__ == "__main__":
     rec = SimpleFaceRecognizer()
     
     if not rec.is_trained:
-        rec.train()
+        rec.train(import_dataset=True)
     
     print(f"Users: {rec.list_users()}")
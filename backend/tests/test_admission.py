@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionConfig, AdmissionController, Shed, TokenBucket
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=2.0, burst=2.0)
+    start = bucket.updated
+
+    assert bucket.try_acquire(start)[0] is True
+    assert bucket.try_acquire(start)[0] is True
+    ok, wait = bucket.try_acquire(start)
+    assert ok is False
+    assert wait == pytest.approx(0.5)
+    assert bucket.try_acquire(start + 0.5)[0] is True
+
+
+def test_session_rate_limit_sheds_with_429():
+    controller = AdmissionController(AdmissionConfig(session_fps=1.0, session_burst=1.0))
+
+    controller.acquire("relay", "10.0.0.2", session="phone1")
+    controller.release("relay")
+    with pytest.raises(Shed) as exc:
+        controller.acquire("relay", "10.0.0.2", session="phone1")
+
+    assert exc.value.status_code == 429
+    assert exc.value.retry_after_header == "1"
+    # Other sessions from the same IP are unaffected
+    controller.acquire("relay", "10.0.0.2", session="phone2")
+    assert controller.stats()["shed"]["relay"]["rate_limited"] == 1
+
+
+def test_lower_priority_work_is_shed_first_under_load():
+    config = AdmissionConfig(
+        global_inflight=4,
+        engine_inflight={"face": 4, "object": 4, "relay": 4},
+    )
+    controller = AdmissionController(config)
+
+    controller.acquire("face", "a")
+    controller.acquire("face", "a")
+    # 2 of 4 in flight: relay (50% share) is shed, object (75%) still admitted
+    with pytest.raises(Shed) as exc:
+        controller.acquire("relay", "b", session="phone")
+    assert exc.value.status_code == 503
+    controller.acquire("object", "c")
+    with pytest.raises(Shed):
+        controller.acquire("object", "c")
+    # Face may use the whole budget
+    controller.acquire("face", "a")
+    with pytest.raises(Shed):
+        controller.acquire("face", "a")
+
+    controller.release("face")
+    controller.acquire("face", "a")
+    inflight = controller.stats()["inflight"]
+    assert (inflight["face"], inflight["object"], inflight["relay"]) == (3, 1, 0)
+
+
+def test_engine_inflight_cap():
+    controller = AdmissionController(AdmissionConfig(engine_inflight={"face": 4, "object": 1, "relay": 16}))
+
+    controller.acquire("object", "a")
+    with pytest.raises(Shed):
+        controller.acquire("object", "a")
+    controller.release("object")
+    controller.acquire("object", "a")
+
+
+def test_contended_request_waits_for_a_slot_instead_of_503():
+    controller = AdmissionController()
+    controller.acquire("object", "a")
+    threading.Timer(0.05, controller.release, args=("object",)).start()
+
+    start = time.monotonic()
+    controller.acquire("object", "b", timeout=2.0)
+
+    assert 0.03 < time.monotonic() - start < 1.0
+    assert controller.stats()["shed"]["object"]["overloaded"] == 0
+
+
+def test_wait_is_bounded_by_timeout_and_queue_depth():
+    config = AdmissionConfig()
+    config.queue_depth["object"] = 1
+    controller = AdmissionController(config)
+    controller.acquire("object", "a")
+
+    with pytest.raises(Shed) as exc:
+        controller.acquire("object", "b", timeout=0.05)
+    assert exc.value.status_code == 503
+
+    # A second waiter beyond the queue depth is shed without waiting
+    waiter = threading.Thread(target=lambda: pytest.raises(Shed, controller.acquire, "object", "c", timeout=0.5))
+    waiter.start()
+    time.sleep(0.05)
+    start = time.monotonic()
+    with pytest.raises(Shed):
+        controller.acquire("object", "d", timeout=0.5)
+    assert time.monotonic() - start < 0.1
+    waiter.join()
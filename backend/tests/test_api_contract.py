@@ -1,10 +1,28 @@
 import numpy as np
+import pytest
 from fastapi.testclient import TestClient
 
 import face_recognition_api as api
+from admission import AdmissionConfig, AdmissionController
+from engine_registry import EngineRegistry
+from frame_store import InMemoryFrameStore
+from image_decode import DecodedImage
 from simple_recognizer import RecognitionResult
 
 
+@pytest.fixture(autouse=True)
+def ready_engines(monkeypatch):
+    monkeypatch.setattr(api.engines, "require", lambda _name: None)
+
+
+@pytest.fixture(autouse=True)
+def isolated_frame_store(monkeypatch):
+    # Keep relay tests out of the real relay_frames.db
+    store = InMemoryFrameStore(ttl_seconds=api.MOBILE_FRAME_TTL_SECONDS)
+    monkeypatch.setattr(api, "mobile_frame_store", store)
+    return store
+
+
 def test_list_users_contract(monkeypatch):
     monkeypatch.setattr(api.recognizer, "list_users", lambda: {1: "Aayush", 2: "Devesh"})
 
@@ -20,8 +38,9 @@ def test_list_users_contract(monkeypatch):
 def test_train_max_samples_passthrough(monkeypatch):
     capture = {}
 
-    def fake_train(max_per_user=100):
+    def fake_train(max_per_user=100, import_dataset=False):
         capture["max_per_user"] = max_per_user
+        capture["import_dataset"] = import_dataset
         return {"processed": 1, "failed": 0, "users": 1}
 
     monkeypatch.setattr(api.recognizer, "train", fake_train)
@@ -31,14 +50,17 @@ def test_train_max_samples_passthrough(monkeypatch):
 
     assert response.status_code == 200
     assert capture["max_per_user"] == 24
+    assert capture["import_dataset"] is False
+    assert client.post("/train?import_dataset=true").status_code == 200
+    assert capture["import_dataset"] is True
     assert response.json()["success"] is True
 
 
 def test_recognize_base64_response_shape(monkeypatch):
     monkeypatch.setattr(
         api,
-        "decode_base64_image",
-        lambda _payload: np.zeros((120, 120, 3), dtype=np.uint8),
+        "decode_upload",
+        lambda _payload, mode, target_side=None: DecodedImage(np.zeros((120, 120), dtype=np.uint8), (120, 120), 1),
     )
     monkeypatch.setattr(
         api.recognizer,
@@ -62,3 +84,383 @@ def test_recognize_base64_response_shape(monkeypatch):
     assert payload["success"] is True
     assert payload["faces"][0]["user_name"] == "Aayush"
     assert "timestamp" in payload
+
+
+def test_unready_engine_fails_fast_with_503(monkeypatch):
+    registry = EngineRegistry()
+    registry.register("face", lambda: None, preload=True)
+    registry.register("yolo", lambda: None, preload=False)
+    monkeypatch.setattr(api, "engines", registry)
+
+    client = TestClient(api.app)
+    response = client.get("/users")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(api.ENGINE_RETRY_AFTER_SECONDS)
+
+
+def test_health_endpoints_report_engine_states(monkeypatch):
+    registry = EngineRegistry()
+    registry.register("face", lambda: None, preload=True)
+    registry.register("yolo", lambda: None, preload=False)
+    monkeypatch.setattr(api, "engines", registry)
+
+    client = TestClient(api.app)
+    assert client.get("/health/live").json() == {"status": "alive"}
+
+    not_ready = client.get("/health/ready")
+    assert not_ready.status_code == 503
+    assert not_ready.json()["engines"]["face"]["state"] == "idle"
+
+    registry.start_all()
+    assert registry.wait("face", timeout=5)
+    ready = client.get("/health/ready")
+    assert ready.status_code == 200
+    assert ready.json()["engines"]["yolo"]["state"] == "idle"
+    assert set(ready.json()["yolo_latency_ms"]) == {str(size) for size in api.yolo_detector.available_imgsz}
+
+
+def test_register_bulk_trains_once_and_reports_reasons(monkeypatch):
+    calls = {"train": 0, "enrolled": []}
+    crop = np.zeros((80, 80), dtype=np.uint8)
+
+    monkeypatch.setattr(api, "decode_face_image", lambda payload: payload)
+    monkeypatch.setattr(
+        api.recognizer,
+        "crop_enrollment_face",
+        lambda img: (crop, "accepted") if img.startswith("face") else (None, "no_face"),
+    )
+
+    def fake_enroll(faces, user_name, user_id=None):
+        calls["enrolled"].append((user_name, len(faces)))
+        return user_id or 7
+
+    def fake_train(max_per_user=100):
+        calls["train"] += 1
+        return {"processed": 3, "failed": 0, "users": 1, "pruned": 0}
+
+    monkeypatch.setattr(api.recognizer, "enroll_faces", fake_enroll)
+    monkeypatch.setattr(api.recognizer, "train", fake_train)
+
+    client = TestClient(api.app)
+    response = client.post("/register-bulk", json={
+        "users": [
+            {"user_name": "Aayush", "images": ["face-1", "blank", "face-2"]},
+            {"user_name": "Nobody", "images": ["blank"]},
+        ]
+    })
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert calls["train"] == 1
+    assert calls["enrolled"] == [("Aayush", 2)]
+    assert payload["users"][0]["user_id"] == 7
+    assert [img["reason"] for img in payload["users"][0]["images"]] == ["accepted", "no_face", "accepted"]
+    assert payload["users"][1]["user_id"] is None
+    assert payload["users"][1]["rejected"] == 1
+
+
+def test_ws_enroll_commits_when_target_reached(monkeypatch):
+    calls = {"train": 0}
+    monkeypatch.setattr(api, "decode_face_image", lambda payload: int(payload))
+    monkeypatch.setattr(api.recognizer, "feature_extractor", lambda: None)
+
+    def fake_offer(self, seed):
+        self.kept_faces.append(seed)
+        return True, "accepted"
+
+    def fake_commit(self):
+        calls["train"] += 1
+        self.committed = True
+        return 11, {"processed": self.kept, "failed": 0, "users": 1, "pruned": 0}
+
+    monkeypatch.setattr(api.EnrollmentSession, "offer", fake_offer)
+    monkeypatch.setattr(api.EnrollmentSession, "commit", fake_commit)
+
+    client = TestClient(api.app)
+    with client.websocket_connect("/ws/enroll") as ws:
+        ws.send_json({"user_name": "Devesh", "target": 2})
+        assert ws.receive_json()["type"] == "started"
+        ws.send_json({"image": "1"})
+        assert ws.receive_json()["kept"] == 1
+        ws.send_json({"image": "2"})
+        assert ws.receive_json()["kept"] == 2
+        committed = ws.receive_json()
+
+    assert committed["type"] == "committed"
+    assert committed["user_id"] == 11
+    assert calls["train"] == 1
+
+
+def test_object_detect_reports_chosen_resolution(monkeypatch):
+    capture = {}
+    monkeypatch.setattr(
+        api,
+        "decode_upload",
+        lambda _payload, mode, target_side=None: DecodedImage(np.zeros((48, 64, 3), dtype=np.uint8), (64, 48), 1),
+    )
+    monkeypatch.setattr(api.yolo_detector, "select_imgsz", lambda budget: 416)
+    monkeypatch.setattr(api.yolo_detector, "ensure_imgsz", lambda imgsz: imgsz)
+
+    def fake_detect(image_bgr, confidence, max_results, imgsz):
+        capture["imgsz"] = imgsz
+        return [{"label": "chair", "score": 0.9, "bbox": [1.0, 2.0, 3.0, 4.0]}], 12.5
+
+    monkeypatch.setattr(api.yolo_detector, "detect", fake_detect)
+
+    client = TestClient(api.app)
+    response = client.post("/object-detect-base64", json={"image": "abc", "latency_budget_ms": 40})
+
+    assert response.status_code == 200
+    assert capture["imgsz"] == 416
+    assert response.json()["imgsz"] == 416
+
+    invalid = client.post("/object-detect-base64", json={"image": "abc", "imgsz": 512})
+    assert invalid.status_code == 400
+
+
+def test_relay_frames_over_session_rate_are_shed_with_retry_after(monkeypatch):
+    controller = AdmissionController(AdmissionConfig(session_fps=1.0, session_burst=2.0))
+    monkeypatch.setattr(api, "admission", controller)
+
+    client = TestClient(api.app)
+    statuses = [
+        client.post("/mobile-stream/phone-1234/frame", json={"image": "abc"}).status_code
+        for _ in range(3)
+    ]
+
+    assert statuses == [200, 200, 429]
+    shed = client.post("/mobile-stream/phone-1234/frame", json={"image": "abc"})
+    assert int(shed.headers["Retry-After"]) >= 1
+    stats = client.get("/admission/stats").json()
+    assert stats["shed"]["relay"]["rate_limited"] == 2
+    assert stats["admitted"]["relay"] == 2
+
+
+def _jpeg_b64(width, height):
+    import base64
+    import cv2
+
+    ok, encoded = cv2.imencode(".jpg", np.zeros((height, width, 3), dtype=np.uint8))
+    return base64.b64encode(encoded.tobytes()).decode()
+
+
+def test_recognize_reports_face_location_in_upload_coordinates(monkeypatch):
+    seen = {}
+
+    def fake_recognize(gray):
+        seen["shape"] = gray.shape
+        return [RecognitionResult(1, "Aayush", 82.3, (10, 80, 90, 5), True)]
+
+    monkeypatch.setattr(api, "FACE_DECODE_SIDE", 500)
+    monkeypatch.setattr(api.recognizer, "recognize", fake_recognize)
+
+    client = TestClient(api.app)
+    response = client.post("/recognize-base64", json={"image": _jpeg_b64(2000, 1200)})
+
+    assert response.status_code == 200
+    assert seen["shape"] == (300, 500)  # decoded straight to grayscale at 1/4
+    assert response.json()["faces"][0]["face_location"] == {"top": 40, "right": 320, "bottom": 360, "left": 20}
+
+
+def test_oversized_upload_is_rejected_with_400(monkeypatch):
+    monkeypatch.setattr(api, "MAX_UPLOAD_PIXELS", 100_000)
+    monkeypatch.setattr(api, "OVERSIZE_POLICY", "reject")
+
+    client = TestClient(api.app)
+    response = client.post("/recognize-base64", json={"image": _jpeg_b64(640, 480)})
+
+    assert response.status_code == 400
+    assert "limit" in response.json()["detail"]
+
+
+def test_relay_frames_are_captured_when_enabled(monkeypatch, tmp_path):
+    from session_capture import CaptureWriter, read_capture
+
+    writer = CaptureWriter(tmp_path / "run.vmcap")
+    monkeypatch.setattr(api, "capture", writer)
+
+    client = TestClient(api.app)
+    response = client.post("/mobile-stream/Phone-1234/frame", json={"image": "aGVsbG8="})
+    writer.close()
+
+    assert response.status_code == 200
+    _started_at, records = read_capture(writer.path)
+    [record] = list(records)
+    assert (record.channel, record.session, record.payload) == ("relay", "phone-1234", b"hello")
+
+
+def test_ws_enroll_labels_offer_errors_separately_from_decode_errors(monkeypatch):
+    monkeypatch.setattr(api.recognizer, "feature_extractor", lambda: None)
+
+    def fake_decode(payload):
+        if payload == "garbage":
+            raise ValueError("bad image")
+        return payload
+
+    def failing_offer(self, img):
+        raise RuntimeError("cascade exploded")
+
+    monkeypatch.setattr(api, "decode_face_image", fake_decode)
+    monkeypatch.setattr(api.EnrollmentSession, "offer", failing_offer)
+
+    client = TestClient(api.app)
+    with client.websocket_connect("/ws/enroll") as ws:
+        ws.send_json({"user_name": "Devesh", "target": 2})
+        assert ws.receive_json()["type"] == "started"
+        ws.send_json({"image": "garbage"})
+        assert ws.receive_json()["reason"].startswith("decode_failed")
+        ws.send_json({"image": "frame"})
+        assert ws.receive_json()["reason"].startswith("offer_failed")
+        ws.send_json({"action": "cancel"})
+        assert ws.receive_json()["type"] == "cancelled"
+
+
+def test_delete_user_is_admitted_as_training(monkeypatch):
+    controller = AdmissionController(AdmissionConfig(queue_timeout={"train": 0.0}))
+    monkeypatch.setattr(api, "admission", controller)
+    monkeypatch.setattr(api.recognizer, "remove_user", lambda user_id: user_id == 3)
+
+    client = TestClient(api.app)
+    assert client.delete("/users/3").status_code == 200
+    assert client.delete("/users/4").status_code == 404
+
+    controller.acquire("train", "other-client")
+    try:
+        busy = client.delete("/users/3")
+    finally:
+        controller.release("train")
+    assert busy.status_code == 503
+    assert "Retry-After" in busy.headers
+
+
+def test_ws_enroll_reports_commit_failures_to_the_client(monkeypatch):
+    monkeypatch.setattr(api, "decode_face_image", lambda payload: payload)
+    monkeypatch.setattr(api.recognizer, "feature_extractor", lambda: None)
+
+    def fake_offer(self, img):
+        self.kept_faces.append(img)
+        return True, "accepted"
+
+    def failing_commit(self):
+        raise IOError("Could not write face sample")
+
+    monkeypatch.setattr(api.EnrollmentSession, "offer", fake_offer)
+    monkeypatch.setattr(api.EnrollmentSession, "commit", failing_commit)
+
+    client = TestClient(api.app)
+    with client.websocket_connect("/ws/enroll") as ws:
+        ws.send_json({"user_name": "Devesh", "target": 5})
+        assert ws.receive_json()["type"] == "started"
+        ws.send_json({"image": "frame"})
+        assert ws.receive_json()["kept"] == 1
+        ws.send_json({"action": "commit"})
+        error = ws.receive_json()
+        ws.send_json({"action": "cancel"})
+        assert ws.receive_json()["type"] == "cancelled"
+
+    assert error["type"] == "error"
+    assert error["error"].startswith("commit_failed")
+
+
+def test_relay_poll_returns_latest_frame_and_prunes_on_an_interval(monkeypatch, isolated_frame_store):
+    pruned = []
+    monkeypatch.setattr(isolated_frame_store, "prune", lambda: pruned.append(1))
+    monkeypatch.setattr(api, "_last_mobile_prune", float("-inf"))
+    monkeypatch.setattr(api, "MOBILE_PRUNE_INTERVAL_SECONDS", 3600)
+
+    client = TestClient(api.app)
+    assert client.get("/mobile-stream/phone-1234/latest").json()["has_frame"] is False
+    client.post("/mobile-stream/phone-1234/frame", json={"image": "abc"})
+    latest = client.get("/mobile-stream/phone-1234/latest").json()
+
+    assert latest["image"] == "abc"
+    assert len(pruned) == 1
+
+
+class _FakeCatalog:
+    def __init__(self, names):
+        self.names = names
+
+    def get_user_name(self, user_id):
+        return self.names.get(user_id)
+
+
+def test_register_bulk_rejects_unknown_user_ids_and_keeps_existing_names(monkeypatch):
+    enrolled = []
+    monkeypatch.setattr(api.recognizer, "catalog", _FakeCatalog({5: "Aayush"}))
+    monkeypatch.setattr(api, "decode_face_image", lambda payload: payload)
+    monkeypatch.setattr(api.recognizer, "crop_enrollment_face", lambda img: (np.zeros((80, 80), np.uint8), "accepted"))
+    monkeypatch.setattr(
+        api.recognizer, "enroll_faces",
+        lambda faces, user_name, user_id=None: enrolled.append((user_id, user_name)) or user_id,
+    )
+    monkeypatch.setattr(api.recognizer, "train", lambda max_per_user=100: {"processed": 1})
+
+    client = TestClient(api.app)
+    unknown = client.post("/register-bulk", json={"users": [
+        {"user_name": "Aayush", "user_id": 5, "images": ["face"]},
+        {"user_name": "Ghost", "user_id": 99, "images": ["face"]},
+    ]})
+    assert unknown.status_code == 404
+    assert enrolled == []
+
+    renamed = client.post("/register-bulk", json={"users": [
+        {"user_name": "Someone Else", "user_id": 5, "images": ["face"]},
+    ]})
+    assert renamed.status_code == 200
+    assert enrolled == [(5, "Aayush")]
+    assert renamed.json()["users"][0]["user_name"] == "Aayush"
+
+
+def test_register_bulk_trains_stored_users_when_a_later_user_fails(monkeypatch):
+    calls = {"train": 0}
+    monkeypatch.setattr(api, "decode_face_image", lambda payload: payload)
+    monkeypatch.setattr(api.recognizer, "crop_enrollment_face", lambda img: (np.zeros((80, 80), np.uint8), "accepted"))
+
+    def fake_enroll(faces, user_name, user_id=None):
+        if user_name == "Broken":
+            raise IOError("disk full")
+        return 7
+
+    def fake_train(max_per_user=100):
+        calls["train"] += 1
+        return {"processed": 1, "failed": 0, "users": 1, "pruned": 0}
+
+    monkeypatch.setattr(api.recognizer, "enroll_faces", fake_enroll)
+    monkeypatch.setattr(api.recognizer, "train", fake_train)
+
+    client = TestClient(api.app)
+    response = client.post("/register-bulk", json={"users": [
+        {"user_name": "Aayush", "images": ["face"]},
+        {"user_name": "Broken", "images": ["face", "face"]},
+    ]})
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert calls["train"] == 1
+    assert payload["users"][0]["user_id"] == 7
+    assert payload["users"][0]["error"] is None
+    assert payload["users"][1]["user_id"] is None
+    assert payload["users"][1]["accepted"] == 0
+    assert payload["users"][1]["error"] == "disk full"
+    assert [img["reason"] for img in payload["users"][1]["images"]] == ["store_failed", "store_failed"]
+
+
+def test_ws_recognize_with_capture_answers_malformed_frames(monkeypatch, tmp_path):
+    from session_capture import CaptureWriter, read_capture
+
+    writer = CaptureWriter(tmp_path / "run.vmcap")
+    monkeypatch.setattr(api, "capture", writer)
+    monkeypatch.setattr(api, "recognize_image", lambda payload: [])
+
+    client = TestClient(api.app)
+    with client.websocket_connect("/ws/recognize") as ws:
+        ws.send_json(["not", "an", "object"])
+        assert ws.receive_json()["success"] is False
+        ws.send_json({"image": "aGVsbG8="})
+        assert ws.receive_json() == {"success": True, "faces": []}
+    writer.close()
+
+    _started_at, records = read_capture(writer.path)
+    assert [(r.channel, r.payload) for r in records] == [("recognize", b"hello")]
@@ -0,0 +1,87 @@
+import json
+
+import cv2
+import numpy as np
+
+import batch_process
+
+
+def _write_frames(folder, count):
+    folder.mkdir()
+    for i in range(count):
+        frame = np.full((48, 64, 3), i * 10, dtype=np.uint8)
+        cv2.imwrite(str(folder / f"frame_{i:03d}.png"), frame)
+
+
+def test_iter_frames_folder_applies_stride_in_sorted_order(tmp_path):
+    _write_frames(tmp_path / "frames", 7)
+
+    frames = list(batch_process.iter_frames(tmp_path / "frames", stride=3))
+
+    assert [index for index, _, _ in frames] == [0, 3, 6]
+    assert [int(frame[0, 0, 0]) for _, _, frame in frames] == [0, 30, 60]
+
+
+def test_iter_frames_video_applies_stride(tmp_path):
+    path = tmp_path / "clip.avi"
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(10):
+        writer.write(np.full((48, 64, 3), i * 20, dtype=np.uint8))
+    writer.release()
+
+    frames = list(batch_process.iter_frames(path, stride=4))
+
+    assert [index for index, _, _ in frames] == [0, 4, 8]
+
+
+def test_decode_ahead_preserves_order_and_reraises():
+    def source():
+        yield from ((i, 0.0, None) for i in range(50))
+        raise RuntimeError("decode failed")
+
+    seen = []
+    try:
+        for item in batch_process.decode_ahead(source(), depth=4):
+            seen.append(item[0])
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("reader error was swallowed")
+    assert seen == list(range(50))
+
+
+def test_run_batch_writes_ordered_jsonl(tmp_path):
+    _write_frames(tmp_path / "frames", 9)
+    output = tmp_path / "out.jsonl"
+    config = batch_process.BatchConfig(faces=False, objects=False)
+
+    stats = batch_process.run_batch(tmp_path / "frames", output, config, stride=2, workers=2)
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [r["frame"] for r in records] == [0, 2, 4, 6, 8]
+    assert stats["frames"] == 5
+    assert stats["workers"] == 2
+
+
+def test_invalid_settings_fail_before_the_pool_starts(tmp_path):
+    import pytest
+
+    _write_frames(tmp_path / "frames", 2)
+    config = batch_process.BatchConfig(faces=False, objects=True, yolo_precision="fp16")
+
+    with pytest.raises(ValueError):
+        batch_process.run_batch(tmp_path / "frames", tmp_path / "out.jsonl", config, workers=2)
+
+
+def test_worker_start_failure_is_reported_by_the_first_task(monkeypatch):
+    import pytest
+
+    def broken(config):
+        raise OSError("model missing")
+
+    monkeypatch.setattr(batch_process, "_build_engines", broken)
+    monkeypatch.setattr(batch_process, "_init_error", None)
+    batch_process._init_worker(batch_process.BatchConfig(faces=True, objects=False))
+
+    with pytest.raises(RuntimeError, match="model missing"):
+        batch_process._process_frame((0, 0.0, np.zeros((8, 8, 3), dtype=np.uint8)))
@@ -0,0 +1,36 @@
+import pytest
+
+from benchmark_quantization import iou, match_detections
+
+
+def _det(label, bbox, score=0.9):
+    return {"label": label, "score": score, "bbox": bbox}
+
+
+def test_iou():
+    assert iou([0, 0, 10, 10], [0, 0, 10, 10]) == 1.0
+    assert iou([0, 0, 10, 10], [5, 0, 15, 10]) == pytest.approx(50 / 150)
+    assert iou([0, 0, 10, 10], [20, 20, 30, 30]) == 0.0
+
+
+def test_match_requires_same_label_and_enough_overlap():
+    reference = [_det("person", [0, 0, 10, 10]), _det("chair", [20, 20, 40, 40])]
+    candidate = [
+        _det("person", [1, 0, 11, 10]),
+        _det("table", [20, 20, 40, 40]),
+        _det("person", [50, 50, 60, 60], score=0.5),
+    ]
+
+    result = match_detections(reference, candidate, iou_threshold=0.5)
+
+    assert result["reference"] == 2
+    assert result["candidate"] == 3
+    assert result["matched"] == 1
+    assert result["mean_iou"] == pytest.approx(90 / 110)
+
+
+def test_each_reference_box_matches_once():
+    reference = [_det("person", [0, 0, 10, 10])]
+    candidate = [_det("person", [0, 0, 10, 10]), _det("person", [0, 0, 10, 9], score=0.8)]
+
+    assert match_detections(reference, candidate)["matched"] == 1
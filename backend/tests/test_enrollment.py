@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+
+from enrollment import EnrollmentSession, QualityGates
+from lbph_gallery import LBPHGallery
+
+
+class FakeRecognizer:
+    def __init__(self):
+        self.enrolled = []
+        self.trained = 0
+
+    def feature_extractor(self):
+        return LBPHGallery(np.empty((0, 0), np.float32), np.empty(0, np.int32))
+
+    def crop_enrollment_face(self, image):
+        return (image, "accepted") if image is not None else (None, "no_face")
+
+    def enroll_faces(self, faces, user_name, user_id=None, qualities=None):
+        self.enrolled.append((user_name, len(faces)))
+        self.qualities = qualities
+        return user_id or 9
+
+    def train(self, max_per_user=100):
+        self.trained += 1
+        return {"processed": len(self.enrolled), "failed": 0, "users": 1, "pruned": 0}
+
+
+def _sharp_face(seed, size=160):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 255, (size, size), dtype=np.uint8)
+
+
+def test_quality_gates_reject_small_blurry_and_duplicate_frames():
+    session = EnrollmentSession(FakeRecognizer(), "Nilisha", target_count=5)
+
+    assert session.offer(None) == (False, "no_face")
+    assert session.offer(_sharp_face(1, size=40)) == (False, "too_small")
+    assert session.offer(cv2.GaussianBlur(_sharp_face(2), (31, 31), 0)) == (False, "blurry")
+    assert session.offer(_sharp_face(3)) == (True, "accepted")
+    assert session.offer(_sharp_face(3)) == (False, "duplicate")
+    assert session.kept == 1
+    assert session.rejections == {"no_face": 1, "too_small": 1, "blurry": 1, "duplicate": 1}
+
+
+def test_commit_enrolls_kept_frames_and_trains_once():
+    recognizer = FakeRecognizer()
+    session = EnrollmentSession(recognizer, "Swornim", target_count=2, gates=QualityGates(min_difference=1.0))
+
+    session.offer(_sharp_face(4))
+    session.offer(_sharp_face(5))
+    assert session.done
+    assert session.offer(_sharp_face(6)) == (False, "target_reached")
+
+    user_id, stats = session.commit()
+
+    assert user_id == 9
+    assert recognizer.enrolled == [("Swornim", 2)]
+    assert recognizer.trained == 1
+    assert recognizer.qualities == [EnrollmentSession.sharpness(cv2.resize(_sharp_face(s), (200, 200))) for s in (4, 5)]
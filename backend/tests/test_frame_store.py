@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from frame_store import InMemoryFrameStore, SQLiteFrameStore
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_put_get_and_prune(kind, tmp_path):
+    store = (
+        InMemoryFrameStore(ttl_seconds=5)
+        if kind == "memory"
+        else SQLiteFrameStore(ttl_seconds=5, db_path=str(tmp_path / "relay.db"))
+    )
+    now = time.time()
+    store.put("fresh", "img-a", "2026-01-01T00:00:00", now)
+    store.put("stale", "img-b", "2026-01-01T00:00:00", now - 60)
+
+    store.prune()
+
+    assert store.get("fresh")["image"] == "img-a"
+    assert store.get("stale") is None
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    db_path = str(tmp_path / "relay.db")
+    writer = SQLiteFrameStore(ttl_seconds=5, db_path=db_path)
+    reader = SQLiteFrameStore(ttl_seconds=5, db_path=db_path)
+
+    writer.put("phone1", "img-1", "t1", time.time())
+    writer.put("phone1", "img-2", "t2", time.time())
+
+    assert reader.get("phone1")["image"] == "img-2"
+
+
+def test_frame_store_interface_is_abstract():
+    from frame_store import FrameStore
+
+    with pytest.raises(TypeError):
+        FrameStore(ttl_seconds=5)
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_expired_frames_are_hidden_before_prune(kind, tmp_path):
+    store = (
+        InMemoryFrameStore(ttl_seconds=5)
+        if kind == "memory"
+        else SQLiteFrameStore(ttl_seconds=5, db_path=str(tmp_path / "relay.db"))
+    )
+    store.put("stale", "img-b", "2026-01-01T00:00:00", time.time() - 60)
+
+    assert store.get("stale") is None
+
+
+def test_sqlite_store_creates_its_file_on_first_use(tmp_path):
+    db_path = tmp_path / "nested" / "relay.db"
+    store = SQLiteFrameStore(ttl_seconds=5, db_path=str(db_path))
+    assert not db_path.exists()
+
+    assert store.get("phone1") is None
+    assert db_path.exists()
@@ -0,0 +1,45 @@
+import cv2
+import numpy as np
+
+from gallery_condensation import condense, evaluate_condensation
+from lbph_gallery import LBPHGallery
+
+
+def _histograms(count, seed):
+    extractor = LBPHGallery(np.empty((0, 0), np.float32), np.empty(0, np.int32))
+    rng = np.random.default_rng(seed)
+    return np.vstack([
+        extractor.histogram(cv2.GaussianBlur(rng.integers(0, 255, (200, 200), dtype=np.uint8), (5, 5), 0))
+        for _ in range(count)
+    ])
+
+
+def test_condense_drops_exact_duplicates():
+    distinct = _histograms(3, seed=1)
+    with_duplicates = np.vstack([distinct, distinct, distinct[:1]])
+
+    kept = condense(with_duplicates, max_keep=10, min_distance=1.0)
+
+    assert len(kept) == 3
+    assert len({tuple(with_duplicates[i][:32]) for i in kept}) == 3
+
+
+def test_condense_respects_cap():
+    assert len(condense(_histograms(8, seed=2), max_keep=4, min_distance=0.0)) == 4
+    assert condense(np.empty((0, 16384), np.float32), max_keep=4) == []
+
+
+def test_evaluation_reports_removed_samples_and_both_galleries():
+    user1 = _histograms(5, seed=3)
+    user2 = _histograms(5, seed=4)
+    # Every training sample duplicated: condensation should remove the copies
+    report = evaluate_condensation(
+        {1: np.vstack([user1, user1]), 2: np.vstack([user2, user2])},
+        max_keep=10,
+        min_distance=1.0,
+        holdout_every=5,
+    )
+
+    assert report["removed_total"] > 0
+    assert report["condensed"]["gallery_size"] < report["full"]["gallery_size"]
+    assert report["condensed"]["accuracy"] == report["full"]["accuracy"]
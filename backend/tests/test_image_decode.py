@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+import pytest
+
+from image_decode import ImageTooLarge, decode_image, reduction_factor
+
+
+def _jpeg(width, height):
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[:, : width // 2] = (0, 0, 255)
+    return cv2.imencode(".jpg", image)[1].tobytes()
+
+
+def test_reduction_factor_keeps_long_side_at_target():
+    assert reduction_factor(4032, 3024, 640, 50_000_000) == 4
+    assert reduction_factor(4032, 3024, 1280, 50_000_000) == 2
+    assert reduction_factor(800, 600, 640, 50_000_000) == 1
+    assert reduction_factor(4032, 3024, None, 50_000_000) == 1
+
+
+def test_reduction_factor_raises_to_fit_pixel_budget():
+    assert reduction_factor(4000, 3000, None, 1_000_000) == 4
+    with pytest.raises(ImageTooLarge):
+        reduction_factor(40000, 30000, None, 1_000_000)
+
+
+def test_decode_gray_at_reduced_resolution():
+    decoded = decode_image(_jpeg(1600, 1200), mode="gray", target_side=400)
+
+    assert decoded.image.shape == (300, 400)
+    assert decoded.factor == 4
+    assert decoded.scale == (4.0, 4.0)
+
+
+def test_decode_colour_modes_keep_channel_order():
+    data = _jpeg(64, 48)
+
+    bgr = decode_image(data, mode="bgr").image
+    rgb = decode_image(data, mode="rgb").image
+
+    assert bgr[24, 8, 2] > 200 and bgr[24, 8, 0] < 50
+    assert rgb[24, 8, 0] > 200 and rgb[24, 8, 2] < 50
+
+
+def test_oversize_policy():
+    data = _jpeg(1000, 800)
+
+    downsampled = decode_image(data, mode="bgr", max_pixels=300_000)
+    assert downsampled.image.shape[:2] == (400, 500)
+
+    with pytest.raises(ImageTooLarge):
+        decode_image(data, mode="bgr", max_pixels=300_000, oversize="reject")
+
+
+def test_invalid_payload_is_a_value_error():
+    with pytest.raises(ValueError):
+        decode_image(b"not an image", mode="gray")
@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+
+from lbph_gallery import GalleryFormatError, LBPHGallery
+
+
+def _faces(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        cv2.GaussianBlur(rng.integers(0, 255, (200, 200), dtype=np.uint8), (5, 5), 0)
+        for _ in range(count)
+    ]
+
+
+@pytest.fixture
+def trained():
+    recognizer = cv2.face.LBPHFaceRecognizer_create(radius=1, neighbors=8, grid_x=8, grid_y=8)
+    recognizer.train(_faces(12), np.arange(12) % 3 + 1)
+    return recognizer
+
+
+def test_predict_matches_opencv(trained):
+    gallery = LBPHGallery.from_recognizer(trained)
+
+    for query in _faces(4, seed=7):
+        label, distance = gallery.predict(query)
+        cv_label, cv_distance = trained.predict(query)
+        assert label == cv_label
+        assert distance == pytest.approx(cv_distance, rel=1e-5)
+
+
+def test_binary_roundtrip_is_memory_mapped(trained, tmp_path):
+    path = tmp_path / "face_model.lbph"
+    LBPHGallery.from_recognizer(trained, model_version=3).save(str(path))
+
+    loaded = LBPHGallery.load(str(path), mmap=True, verify=True)
+
+    assert isinstance(loaded.histograms, np.memmap)
+    assert loaded.model_version == 3
+    assert np.array_equal(loaded.labels, np.arange(12) % 3 + 1)
+    assert loaded.predict(_faces(1, seed=9)[0])[0] == trained.predict(_faces(1, seed=9)[0])[0]
+
+
+def test_concurrent_saves_leave_one_intact_model(trained, tmp_path):
+    path = tmp_path / "face_model.lbph"
+    galleries = [LBPHGallery.from_recognizer(trained, model_version=v) for v in range(8)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda g: g.save(str(path)), galleries))
+
+    loaded = LBPHGallery.load(str(path), verify=True)
+    assert loaded.model_version in range(8)
+    assert [p.name for p in tmp_path.iterdir()] == ["face_model.lbph"]
+
+
+def test_checksum_detects_corruption(trained, tmp_path):
+    path = tmp_path / "face_model.lbph"
+    LBPHGallery.from_recognizer(trained).save(str(path))
+
+    raw = bytearray(path.read_bytes())
+    raw[-5] ^= 0xFF
+    path.write_bytes(bytes(raw))
+
+    with pytest.raises(GalleryFormatError):
+        LBPHGallery.load(str(path), verify=True)
+
+
+def test_yaml_export_and_import_interoperate_with_opencv(trained, tmp_path):
+    gallery = LBPHGallery.from_recognizer(trained)
+    yaml_path = tmp_path / "face_model.yml"
+    gallery.export_yaml(str(yaml_path))
+
+    reloaded = cv2.face.LBPHFaceRecognizer_create()
+    reloaded.read(str(yaml_path))
+    query = _faces(1, seed=11)[0]
+    assert reloaded.predict(query)[0] == trained.predict(query)[0]
+
+    imported = LBPHGallery.import_yaml(str(yaml_path))
+    assert np.array_equal(imported.histograms, gallery.histograms)
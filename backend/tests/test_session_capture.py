@@ -0,0 +1,82 @@
+import base64
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from replay_capture import replay
+from session_capture import CaptureFormatError, CaptureWriter, read_capture
+
+
+def test_capture_round_trip_keeps_order_sessions_and_payloads(tmp_path):
+    jpeg = b"\xff\xd8\xff\xe0fake-jpeg"
+    path = tmp_path / "run.vmcap"
+    writer = CaptureWriter(path)
+    writer.record("recognize", "conn-a", "data:image/jpeg;base64," + base64.b64encode(jpeg).decode())
+    writer.record("relay", "phone-1", base64.b64encode(b"second").decode())
+    writer.record("recognize", "conn-a", "not base64!")
+    writer.close()
+
+    _started_at, records = read_capture(path)
+    records = list(records)
+
+    assert [(r.channel, r.session) for r in records] == [
+        ("recognize", "conn-a"), ("relay", "phone-1"), ("recognize", "conn-a"),
+    ]
+    assert records[0].payload == jpeg  # stored as raw bytes, not base64
+    assert base64.b64decode(records[1].image_b64()) == b"second"
+    assert records[2].image_b64() == "not base64!"
+    assert records[0].offset <= records[1].offset <= records[2].offset
+
+
+def test_capture_stops_at_size_limit_and_tolerates_truncation(tmp_path):
+    path = tmp_path / "run.vmcap"
+    writer = CaptureWriter(path, max_bytes=200)
+    for _ in range(10):
+        writer.record("relay", "phone-1", base64.b64encode(b"x" * 40).decode())
+    assert not writer.active
+    assert writer.frames == 2
+
+    path.write_bytes(path.read_bytes()[:-5])
+    _started_at, records = read_capture(path)
+    assert len(list(records)) == 1
+
+
+def test_read_capture_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a capture file at all")
+    with pytest.raises(CaptureFormatError):
+        read_capture(path)
+
+
+def test_replay_polls_latest_frame_at_captured_pacing(tmp_path):
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            seen.append(self.path)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b'{"success": true, "has_frame": false}')
+
+        def log_message(self, *args):
+            pass
+
+    path = tmp_path / "run.vmcap"
+    writer = CaptureWriter(path)
+    writer.record("poll", "phone-1", "")
+    writer.record("poll", "phone-1", "")
+    writer.close()
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        report = replay(path, f"http://127.0.0.1:{server.server_port}", speed=10.0, timeout=5.0)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert seen == ["/mobile-stream/phone-1/latest"] * 2
+    assert report["channels"]["poll"]["answered"] == 2
+    assert report["channels"]["poll"]["dropped"] == 0
@@ -0,0 +1,158 @@
+import numpy as np
+import pytest
+
+from simple_recognizer import SimpleFaceRecognizer
+
+
+def _recognizer(tmp_path, **kwargs):
+    return SimpleFaceRecognizer(
+        dataset_path=str(tmp_path / "dataset"),
+        model_path=str(tmp_path / "face_model.lbph"),
+        user_mapping_path=str(tmp_path / "user_mapping.json"),
+        catalog_path=str(tmp_path / "user_catalog.db"),
+        legacy_model_path=None,
+        **kwargs,
+    )
+
+
+def _enroll(recognizer, user_id, count, seed):
+    rng = np.random.default_rng(seed)
+    recognizer.catalog.ensure_user(user_id, f"User{user_id}")
+    for _ in range(count):
+        recognizer._store_sample(rng.integers(0, 255, (120, 120), dtype=np.uint8), user_id, f"User{user_id}")
+
+
+def test_worker_picks_up_model_trained_by_another_process(tmp_path):
+    trainer = _recognizer(tmp_path)
+    worker = _recognizer(tmp_path, reload_interval=0.0)
+    assert worker.is_trained is False
+
+    _enroll(trainer, 1, 2, seed=1)
+    _enroll(trainer, 2, 2, seed=2)
+    trainer.train()
+
+    assert worker.refresh_if_stale() is True
+    assert worker.is_trained is True
+    assert worker.gallery.model_version == trainer.gallery.model_version
+    assert worker.user_names == {1: "User1", 2: "User2"}
+    assert worker.refresh_if_stale() is False
+
+
+def test_removing_last_user_clears_model_in_other_workers(tmp_path):
+    trainer = _recognizer(tmp_path)
+    _enroll(trainer, 1, 3, seed=3)
+    trainer.train()
+    worker = _recognizer(tmp_path, reload_interval=0.0)
+    assert worker.is_trained is True
+
+    assert trainer.remove_user(1) is True
+
+    worker.refresh_if_stale()
+    assert worker.is_trained is False
+    assert worker.list_users() == {}
+
+
+def test_enroll_faces_batches_samples_without_training(tmp_path):
+    recognizer = _recognizer(tmp_path)
+    rng = np.random.default_rng(5)
+    faces = [rng.integers(0, 255, (90, 90), dtype=np.uint8) for _ in range(3)]
+
+    user_id = recognizer.enroll_faces(faces, "Mamta", qualities=[90.0, 120.0, 75.5])
+
+    assert recognizer.is_trained is False
+    assert recognizer.catalog.count_samples(user_id) == 3
+    assert [s.quality for s in recognizer.catalog.list_samples(user_id=user_id)] == [90.0, 120.0, 75.5]
+    assert recognizer.enroll_faces(faces[:1], "Renamed", user_id=user_id) == user_id
+    assert recognizer.catalog.count_samples(user_id) == 4
+    assert recognizer.list_users() == {user_id: "Mamta"}
+    with pytest.raises(ValueError):
+        recognizer.enroll_faces(faces[:1], "Ghost", user_id=99)
+    assert recognizer.list_users() == {user_id: "Mamta"}
+
+
+def test_train_imports_images_copied_into_dataset_only_when_asked(tmp_path):
+    import cv2
+
+    recognizer = _recognizer(tmp_path)
+    rng = np.random.default_rng(9)
+    for user_id in (1, 2):
+        folder = tmp_path / "dataset" / f"user{user_id}"
+        folder.mkdir(parents=True)
+        for i in range(3):
+            cv2.imwrite(str(folder / f"{i}.jpg"), rng.integers(0, 255, (120, 120), dtype=np.uint8))
+
+    assert recognizer.train()["processed"] == 0
+    assert recognizer.catalog.count_samples() == 0
+
+    stats = recognizer.train(import_dataset=True)
+
+    assert stats["processed"] + stats["pruned"] == 6
+    assert recognizer.is_trained is True
+    assert recognizer.list_users() == {1: "User1", 2: "User2"}
+
+
+def test_each_thread_gets_its_own_face_cascade(tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    import threading
+
+    import simple_recognizer
+
+    created = []
+
+    class FakeCascade:
+        def __init__(self, path):
+            created.append(self)
+            self.owner = threading.get_ident()
+
+        def detectMultiScale(self, gray, **kwargs):
+            assert self.owner == threading.get_ident()
+            return []
+
+    monkeypatch.setattr(simple_recognizer.cv2, "CascadeClassifier", FakeCascade)
+    recognizer = _recognizer(tmp_path)
+    barrier = threading.Barrier(4)
+
+    def detect(_):
+        barrier.wait()
+        return recognizer._detect_faces(np.zeros((64, 64), dtype=np.uint8))
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        assert list(pool.map(detect, range(8))) == [[]] * 8
+
+    assert len(created) == 4
+
+
+def test_enroll_faces_with_a_frozen_clock_keeps_every_crop(tmp_path, monkeypatch):
+    from datetime import datetime
+
+    import simple_recognizer
+
+    class FrozenClock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2026, 1, 1, 12, 0, 0)
+
+    monkeypatch.setattr(simple_recognizer, "datetime", FrozenClock)
+    recognizer = _recognizer(tmp_path)
+    faces = [np.full((90, 90), i * 40, dtype=np.uint8) for i in range(4)]
+
+    user_id = recognizer.enroll_faces(faces, "Mamta")
+
+    assert recognizer.catalog.count_samples(user_id) == 4
+    assert len(list((tmp_path / "dataset" / f"user{user_id}").glob("*.jpg"))) == 4
+
+
+def test_failed_enrollment_leaves_no_files_or_user(tmp_path, monkeypatch):
+    recognizer = _recognizer(tmp_path)
+
+    def broken_add_samples(user_id, paths, qualities=None):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(recognizer.catalog, "add_samples", broken_add_samples)
+    faces = [np.zeros((90, 90), dtype=np.uint8) for _ in range(3)]
+
+    with pytest.raises(RuntimeError):
+        recognizer.enroll_faces(faces, "Mamta")
+
+    assert recognizer.list_users() == {}
+    assert list((tmp_path / "dataset").rglob("*.jpg")) == []
@@ -0,0 +1,97 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from user_catalog import UserCatalog
+
+
+def test_migrates_legacy_mapping_and_dataset_once(tmp_path):
+    mapping = tmp_path / "user_mapping.json"
+    mapping.write_text(json.dumps({"1": "Aayush", "2": "Devesh"}), encoding="utf-8")
+    dataset = tmp_path / "dataset"
+    (dataset / "user1").mkdir(parents=True)
+    (dataset / "user3").mkdir(parents=True)
+    (dataset / "user1" / "a.jpg").write_bytes(b"x")
+    (dataset / "user1" / "b.jpg").write_bytes(b"x")
+    (dataset / "user3" / "c.jpg").write_bytes(b"x")
+
+    catalog = UserCatalog(str(tmp_path / "catalog.db"))
+
+    assert catalog.migrate_legacy(mapping, dataset) is True
+    assert catalog.migrate_legacy(mapping, dataset) is False
+    assert catalog.get_user_names() == {1: "Aayush", 2: "Devesh", 3: "User3"}
+    assert [s.path for s in catalog.list_samples()] == ["user1/a.jpg", "user1/b.jpg", "user3/c.jpg"]
+    assert catalog.next_user_id() == 4
+
+
+def test_concurrent_registrations_get_unique_ids(tmp_path):
+    catalog = UserCatalog(str(tmp_path / "catalog.db"))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        ids = list(pool.map(lambda i: catalog.create_user(f"user-{i}"), range(40)))
+
+    assert sorted(ids) == list(range(1, 41))
+
+
+def test_list_samples_caps_per_user_and_delete_cascades(tmp_path):
+    catalog = UserCatalog(str(tmp_path / "catalog.db"))
+    first = catalog.create_user("A")
+    second = catalog.create_user("B")
+    for i in range(5):
+        catalog.add_sample(first, f"user{first}/{i}.jpg")
+    catalog.add_sample(second, f"user{second}/0.jpg")
+
+    capped = catalog.list_samples(max_per_user=2)
+    assert [s.path for s in capped] == ["user1/0.jpg", "user1/1.jpg", "user2/0.jpg"]
+
+    version = catalog.record_model_version("face_model.yml", [s.id for s in capped])
+    assert catalog.latest_model_version() == version
+    assert len(catalog.model_sample_ids(version)) == 3
+
+    assert catalog.delete_user(first) is True
+    assert catalog.count_samples() == 1
+    assert len(catalog.model_sample_ids(version)) == 1
+    assert [s.quality for s in catalog.list_samples()] == [None]
+    # Deleted IDs are never handed out again
+    assert catalog.create_user("C") == 3
+
+
+def test_import_dataset_adds_only_new_files(tmp_path):
+    dataset = tmp_path / "dataset"
+    (dataset / "user1").mkdir(parents=True)
+    (dataset / "user1" / "a.jpg").write_bytes(b"x")
+    catalog = UserCatalog(str(tmp_path / "catalog.db"))
+    catalog.migrate_legacy(tmp_path / "missing.json", dataset)
+
+    (dataset / "user1" / "b.jpg").write_bytes(b"x")
+    (dataset / "user4").mkdir()
+    (dataset / "user4" / "c.jpg").write_bytes(b"x")
+
+    assert catalog.import_dataset(dataset) == 2
+    assert catalog.import_dataset(dataset) == 0
+    assert catalog.get_user_names() == {1: "User1", 4: "User4"}
+    assert [s.path for s in catalog.list_samples()] == ["user1/a.jpg", "user1/b.jpg", "user4/c.jpg"]
+
+
+def test_list_samples_spread_keeps_newest_and_spans_history(tmp_path):
+    catalog = UserCatalog(str(tmp_path / "catalog.db"))
+    user = catalog.create_user("A")
+    for i in range(10):
+        catalog.add_sample(user, f"user{user}/{i}.jpg")
+    other = catalog.create_user("B")
+    catalog.add_sample(other, f"user{other}/0.jpg")
+
+    spread = catalog.list_samples(max_per_user=4, spread=True)
+
+    assert [s.path for s in spread] == [
+        "user1/1.jpg", "user1/4.jpg", "user1/6.jpg", "user1/9.jpg", "user2/0.jpg",
+    ]
+    assert len(catalog.list_samples(max_per_user=20, spread=True)) == 11
+
+
+def test_add_samples_records_quality(tmp_path):
+    catalog = UserCatalog(str(tmp_path / "catalog.db"))
+    user = catalog.create_user("A")
+
+    catalog.add_samples(user, ["user1/a.jpg", "user1/b.jpg"], qualities=[120.5, 88.0])
+
+    assert [s.quality for s in catalog.list_samples()] == [120.5, 88.0]
@@ -0,0 +1,194 @@
+import sys
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+from yolo_onnx_detector import YoloOnnxDetector, to_input_tensor
+
+
+def _detector():
+    return YoloOnnxDetector(model_path="models/yolo11n.onnx", imgsz_options=(640, 320, 416))
+
+
+def test_each_resolution_gets_its_own_export_path():
+    detector = _detector()
+
+    assert detector.imgsz_options == (320, 416, 640)
+    assert detector.model_path_for(640).name == "yolo11n.onnx"
+    assert detector.model_path_for(320).name == "yolo11n-320.onnx"
+
+
+def test_budget_picks_largest_resolution_that_fits():
+    detector = _detector()
+    # Nothing measured yet: stay safe with the smallest size
+    assert detector.select_imgsz(50) == 320
+
+    for latency in (10.0, 12.0, 11.0):
+        detector.record_latency(320, latency)
+    # 416 estimated from 320 by area (~18.6 ms), 640 (~44 ms)
+    assert detector.select_imgsz(20) == 416
+    assert detector.select_imgsz(50) == 640
+    assert detector.select_imgsz(5) == 320
+    assert detector.latency_profile() == {320: 11.0, 416: 18.59, 640: 44.0}
+
+    for latency in (30.0, 32.0):
+        detector.record_latency(416, latency)
+    assert detector.select_imgsz(20) == 320
+
+
+def test_stale_slow_measurement_expires_so_larger_sizes_are_retried():
+    detector = _detector()
+    now = [0.0]
+    detector.clock = lambda: now[0]
+
+    detector.record_latency(640, 400.0)  # one slow outlier at the largest size
+    for _ in range(5):
+        detector.record_latency(320, 11.0)
+        detector.record_latency(416, 250.0)
+    assert detector.select_imgsz(60) == 320
+
+    # 320 keeps being measured; the other sizes' samples age out
+    now[0] = detector.latency_max_age_s + 1
+    detector.record_latency(320, 11.0)
+    assert detector.estimated_latency_ms(416) == pytest.approx(11.0 * (416 / 320) ** 2)
+    assert detector.select_imgsz(60) == 640
+
+
+def test_warmup_loads_only_the_default_size_and_runs_a_dummy_predict(monkeypatch):
+    predicted = []
+
+    class FakeYOLO:
+        def __init__(self, path, task=None):
+            self.path = path
+
+        def predict(self, source, imgsz, **kwargs):
+            predicted.append((self.path, source.shape, imgsz))
+            return []
+
+    monkeypatch.setitem(sys.modules, "ultralytics", types.SimpleNamespace(YOLO=FakeYOLO))
+    detector = _detector()
+    monkeypatch.setattr(detector, "prepare_model", lambda imgsz: None)
+
+    detector.warmup()
+
+    assert predicted == [(str(detector.model_path_for(640)), (640, 640, 3), 640)]
+    assert detector.estimated_latency_ms(640) is None  # the dummy predict is not timed
+
+
+def test_size_that_fails_to_load_is_skipped(monkeypatch):
+    detector = _detector()
+    loaded = []
+
+    def fake_load(imgsz):
+        if imgsz == 320:
+            raise RuntimeError("export failed")
+        loaded.append(imgsz)
+
+    monkeypatch.setattr(detector, "_ensure_model_loaded", fake_load)
+
+    assert detector.ensure_imgsz(320) == 640
+    assert detector.ensure_imgsz(416) == 416
+    assert detector.available_imgsz == (416, 640)
+    assert detector.select_imgsz(1) == 416
+    assert detector.resolve_imgsz(imgsz=320) == 640
+    assert loaded == [640, 416]
+
+
+def test_resolve_imgsz_validates_explicit_sizes():
+    detector = _detector()
+
+    assert detector.resolve_imgsz() == 640
+    assert detector.resolve_imgsz(imgsz=416) == 416
+    with pytest.raises(ValueError):
+        detector.resolve_imgsz(imgsz=512)
+
+
+def test_int8_variant_paths_and_engine_name():
+    detector = YoloOnnxDetector(imgsz_options=(320, 640), precision="int8")
+
+    assert detector.engine_name == "yolo-onnx-int8"
+    assert detector.model_path_for(640).name == "yolo11n-int8.onnx"
+    assert detector.model_path_for(320).name == "yolo11n-320-int8.onnx"
+    assert detector.model_path_for(320, "fp32").name == "yolo11n-320.onnx"
+    with pytest.raises(ValueError):
+        YoloOnnxDetector(precision="fp16")
+
+
+def _write_tiny_conv_model(path):
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(0)
+    weight = numpy_helper.from_array(rng.normal(size=(4, 3, 3, 3)).astype(np.float32), "w")
+    graph = helper.make_graph(
+        [helper.make_node("Conv", ["images", "w"], ["conv"], pads=[1, 1, 1, 1]),
+         helper.make_node("Relu", ["conv"], ["output0"])],
+        "tiny",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, [1, 3, 32, 32])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, [1, 4, 32, 32])],
+        initializer=[weight],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    helper.set_model_props(model, {"names": "{0: 'person'}", "imgsz": "[32, 32]"})
+    onnx.save(model, str(path))
+    return onnx
+
+
+@pytest.mark.parametrize("calibrated", [False, True])
+def test_quantize_int8_keeps_metadata_and_runs(tmp_path, calibrated):
+    ort = pytest.importorskip("onnxruntime")
+    onnx = _write_tiny_conv_model(tmp_path / "yolo11n-32.onnx")
+
+    calibration_dir = None
+    if calibrated:
+        calibration_dir = tmp_path / "calib"
+        calibration_dir.mkdir()
+        rng = np.random.default_rng(1)
+        for i in range(3):
+            cv2.imwrite(str(calibration_dir / f"{i}.jpg"), rng.integers(0, 255, (48, 64, 3), dtype=np.uint8))
+
+    detector = YoloOnnxDetector(
+        model_path=str(tmp_path / "yolo11n.onnx"),
+        imgsz_options=(32,),
+        precision="int8",
+        calibration_dir=str(calibration_dir) if calibration_dir else None,
+    )
+    int8_path = detector.quantize_int8(32)
+
+    assert int8_path.name == "yolo11n-32-int8.onnx"
+    props = {p.key: p.value for p in onnx.load(str(int8_path)).metadata_props}
+    assert props["names"] == "{0: 'person'}"
+
+    session = ort.InferenceSession(str(int8_path), providers=["CPUExecutionProvider"])
+    frame = np.zeros((20, 40, 3), dtype=np.uint8)
+    (output,) = session.run(None, {"images": to_input_tensor(frame, 32)})
+    assert output.shape == (1, 4, 32, 32)
+
+
+def test_limit_onnxruntime_threads_applies_to_new_sessions(monkeypatch):
+    pytest.importorskip("onnx")
+    ort = pytest.importorskip("onnxruntime")
+    from onnx import TensorProto, helper
+
+    from yolo_onnx_detector import limit_onnxruntime_threads
+
+    graph = helper.make_graph(
+        [helper.make_node("Relu", ["x"], ["y"])],
+        "relu",
+        [helper.make_tensor_value_info("x", TensorProto.FLOAT, [1, 4])],
+        [helper.make_tensor_value_info("y", TensorProto.FLOAT, [1, 4])],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+
+    original = ort.InferenceSession
+    monkeypatch.setattr(ort, "InferenceSession", original)
+    limit_onnxruntime_threads(1)
+    limit_onnxruntime_threads(1)  # idempotent: wraps the original class only once
+    session = ort.InferenceSession(model.SerializeToString(), providers=["CPUExecutionProvider"])
+
+    assert session.get_session_options().intra_op_num_threads == 1
+    assert type(session).__mro__[1] is original
@@ -0,0 +1,345 @@
+"""
+SQLite catalog for Vision Mate users and enrollment samples.
+Replaces the rewrite-everything user_mapping.json and dataset folder walks
+with an embedded, transactional store (WAL mode, safe across processes).
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    path TEXT NOT NULL UNIQUE,
+    quality REAL,
+    created_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_samples_user ON samples(user_id, created_at, id);
+
+CREATE TABLE IF NOT EXISTS model_versions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model_path TEXT NOT NULL,
+    sample_count INTEGER NOT NULL,
+    created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS model_samples (
+    model_version_id INTEGER NOT NULL REFERENCES model_versions(id) ON DELETE CASCADE,
+    sample_id INTEGER NOT NULL REFERENCES samples(id) ON DELETE CASCADE,
+    PRIMARY KEY (model_version_id, sample_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_model_samples_sample ON model_samples(sample_id);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+LEGACY_MIGRATION_KEY = "legacy_migrated_at"
+
+
+@dataclass(frozen=True)
+class SampleRecord:
+    """One enrollment sample as stored in the catalog"""
+    id: int
+    user_id: int
+    path: str
+    quality: Optional[float]
+    created_at: str
+
+
+class UserCatalog:
+    """Transactional store for users, samples and model versions."""
+
+    def __init__(self, db_path: str = "user_catalog.db", timeout: float = 30.0) -> None:
+        self.db_path = Path(db_path)
+        self.timeout = timeout
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._read() as conn:
+            # WAL is persistent in the database file, so setting it once is enough.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; writes open explicit BEGIN IMMEDIATE transactions so
+        # concurrent writers queue on the database lock instead of deadlocking.
+        conn = sqlite3.connect(str(self.db_path), timeout=self.timeout, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def _read(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now().isoformat()
+
+    # Users
+    def create_user(self, name: str) -> int:
+        """Insert a user and return its newly allocated ID (IDs are never reused)."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO users (name, created_at) VALUES (?, ?)",
+                (name, self._now()),
+            )
+            return int(cursor.lastrowid)
+
+    def ensure_user(self, user_id: int, name: str) -> None:
+        """Create the user with an explicit ID, or rename it if it already exists."""
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO users (id, name, created_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET name = excluded.name",
+                (user_id, name, self._now()),
+            )
+
+    def delete_user(self, user_id: int) -> bool:
+        """Delete a user and (via cascade) all of its samples."""
+        with self._transaction() as conn:
+            cursor = conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+            return cursor.rowcount > 0
+
+    def get_user_name(self, user_id: int) -> Optional[str]:
+        with self._read() as conn:
+            row = conn.execute("SELECT name FROM users WHERE id = ?", (user_id,)).fetchone()
+        return row["name"] if row else None
+
+    def get_user_names(self) -> Dict[int, str]:
+        with self._read() as conn:
+            rows = conn.execute("SELECT id, name FROM users ORDER BY id").fetchall()
+        return {int(row["id"]): row["name"] for row in rows}
+
+    def next_user_id(self) -> int:
+        """Preview the ID the next create_user() call will allocate."""
+        with self._read() as conn:
+            row = conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'users'"
+            ).fetchone()
+        return int(row["seq"]) + 1 if row else 1
+
+    # Samples
+    def add_sample(self, user_id: int, path: str, quality: Optional[float] = None) -> int:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO samples (user_id, path, quality, created_at) VALUES (?, ?, ?, ?)",
+                (user_id, path, quality, self._now()),
+            )
+            return int(cursor.lastrowid)
+
+    def add_samples(
+        self,
+        user_id: int,
+        paths: Sequence[str],
+        qualities: Optional[Sequence[Optional[float]]] = None,
+    ) -> List[int]:
+        """Insert several samples for one user in a single transaction."""
+        if qualities is None:
+            qualities = [None] * len(paths)
+        elif len(qualities) != len(paths):
+            raise ValueError("qualities must have one entry per path")
+        now = self._now()
+        with self._transaction() as conn:
+            return [
+                int(conn.execute(
+                    "INSERT INTO samples (user_id, path, quality, created_at) VALUES (?, ?, ?, ?)",
+                    (user_id, path, quality, now),
+                ).lastrowid)
+                for path, quality in zip(paths, qualities)
+            ]
+
+    def list_samples(
+        self,
+        max_per_user: Optional[int] = None,
+        user_id: Optional[int] = None,
+        spread: bool = False,
+    ) -> List[SampleRecord]:
+        """Samples ordered by user then enrollment time, optionally capped per user.
+
+        The cap keeps the oldest samples; with spread=True it keeps the newest
+        one and the rest evenly spaced back through the user's history.
+        """
+        if spread:
+            # age 0 is the newest sample; keep the first age in each of
+            # max_per_user equal buckets over the user's samples
+            query = (
+                "SELECT id, user_id, path, quality, created_at FROM ("
+                "  SELECT s.*,"
+                "    ROW_NUMBER() OVER (PARTITION BY s.user_id ORDER BY s.created_at DESC, s.id DESC) - 1 AS age,"
+                "    COUNT(*) OVER (PARTITION BY s.user_id) AS total"
+                "  FROM samples s"
+                "  WHERE (? IS NULL OR s.user_id = ?)"
+                ") WHERE (? IS NULL OR total <= ? OR age = 0"
+                "  OR (age * ?) / total > ((age - 1) * ?) / total) "
+                "ORDER BY user_id, created_at, id"
+            )
+            params = (user_id, user_id, max_per_user, max_per_user, max_per_user, max_per_user)
+        else:
+            query = (
+                "SELECT id, user_id, path, quality, created_at FROM ("
+                "  SELECT s.*, ROW_NUMBER() OVER ("
+                "    PARTITION BY s.user_id ORDER BY s.created_at, s.id"
+                "  ) AS rank FROM samples s"
+                "  WHERE (? IS NULL OR s.user_id = ?)"
+                ") WHERE (? IS NULL OR rank <= ?) "
+                "ORDER BY user_id, created_at, id"
+            )
+            params = (user_id, user_id, max_per_user, max_per_user)
+        with self._read() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [
+            SampleRecord(
+                id=int(row["id"]),
+                user_id=int(row["user_id"]),
+                path=row["path"],
+                quality=row["quality"],
+                created_at=row["created_at"],
+            )
+            for row in rows
+        ]
+
+    def count_samples(self, user_id: Optional[int] = None) -> int:
+        with self._read() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS n FROM samples WHERE (? IS NULL OR user_id = ?)",
+                (user_id, user_id),
+            ).fetchone()
+        return int(row["n"])
+
+    # Model versions
+    def record_model_version(self, model_path: str, sample_ids: Sequence[int]) -> int:
+        """Record a trained model and exactly which samples went into it."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO model_versions (model_path, sample_count, created_at) VALUES (?, ?, ?)",
+                (model_path, len(sample_ids), self._now()),
+            )
+            version_id = int(cursor.lastrowid)
+            conn.executemany(
+                "INSERT OR IGNORE INTO model_samples (model_version_id, sample_id) VALUES (?, ?)",
+                [(version_id, int(sample_id)) for sample_id in sample_ids],
+            )
+            return version_id
+
+    def latest_model_version(self) -> Optional[int]:
+        with self._read() as conn:
+            row = conn.execute("SELECT MAX(id) AS id FROM model_versions").fetchone()
+        return int(row["id"]) if row and row["id"] is not None else None
+
+    def model_sample_ids(self, version_id: int) -> List[int]:
+        with self._read() as conn:
+            rows = conn.execute(
+                "SELECT sample_id FROM model_samples WHERE model_version_id = ? ORDER BY sample_id",
+                (version_id,),
+            ).fetchall()
+        return [int(row["sample_id"]) for row in rows]
+
+    # Dataset folders
+    @staticmethod
+    def _scan_dataset(dataset_path: Path) -> List[tuple]:
+        """(user_id, dataset-relative path, mtime) for every dataset/userN/*.jpg"""
+        samples: List[tuple] = []
+        if not dataset_path.exists():
+            return samples
+        for user_folder in sorted(dataset_path.iterdir()):
+            if not user_folder.is_dir():
+                continue
+            try:
+                user_id = int(''.join(filter(str.isdigit, user_folder.name)))
+            except ValueError:
+                continue
+            for img_path in sorted(user_folder.glob("*.jpg")):
+                created = datetime.fromtimestamp(img_path.stat().st_mtime).isoformat()
+                rel_path = img_path.relative_to(dataset_path).as_posix()
+                samples.append((user_id, rel_path, created))
+        return samples
+
+    @staticmethod
+    def _insert_scanned(conn: sqlite3.Connection, names: Dict[int, str], samples: List[tuple]) -> int:
+        for user_id, _path, _created in samples:
+            names.setdefault(user_id, f"User{user_id}")
+        now = datetime.now().isoformat()
+        conn.executemany(
+            "INSERT OR IGNORE INTO users (id, name, created_at) VALUES (?, ?, ?)",
+            [(user_id, name, now) for user_id, name in sorted(names.items())],
+        )
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO samples (user_id, path, created_at) VALUES (?, ?, ?)",
+            samples,
+        )
+        return conn.total_changes - before
+
+    def import_dataset(self, dataset_path: Path) -> int:
+        """
+        Add images copied into dataset/userN/ that the catalog doesn't know yet
+        (unknown users get a default name). Returns the number of new samples.
+        """
+        samples = self._scan_dataset(dataset_path)
+        if not samples:
+            return 0
+        with self._transaction() as conn:
+            return self._insert_scanned(conn, {}, samples)
+
+    # Legacy import
+    def migrate_legacy(self, user_mapping_path: Path, dataset_path: Path) -> bool:
+        """
+        One-time import of user_mapping.json and dataset/userN/*.jpg.
+        Returns True if a migration ran, False if it already happened.
+        """
+        with self._transaction() as conn:
+            done = conn.execute(
+                "SELECT value FROM meta WHERE key = ?", (LEGACY_MIGRATION_KEY,)
+            ).fetchone()
+            if done:
+                return False
+
+            names: Dict[int, str] = {}
+            if user_mapping_path.exists():
+                with open(user_mapping_path, 'r', encoding='utf-8') as f:
+                    names = {int(k): v for k, v in json.load(f).items()}
+
+            self._insert_scanned(conn, names, self._scan_dataset(dataset_path))
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?)", (LEGACY_MIGRATION_KEY, self._now())
+            )
+            return True
@@ -1,36 +1,136 @@
 """
 YOLO ONNX object detector for Vision Mate.
 Provides a true backend inference path for higher-accuracy object detection.
+An INT8-quantized variant (ONNX Runtime static or dynamic quantization) can be
+produced from the FP32 export and served instead on CPU-only nodes.
 """
 
 from __future__ import annotations
 
+import os
 import shutil
+import statistics
 import time
+from collections import deque
 from pathlib import Path
 from threading import Lock
-from typing import Dict, List, Tuple
+from typing import Any, Deque, Dict, List, Optional, Sequence, Set, Tuple
 
 import numpy as np
 
 
+DEFAULT_IMGSZ = 640
+PRECISIONS = ("fp32", "int8")
+CALIBRATION_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def letterbox(image_bgr: np.ndarray, imgsz: int) -> np.ndarray:
+    """Resize keeping aspect ratio and pad to imgsz x imgsz (YOLO's grey 114 border)."""
+    import cv2
+
+    height, width = image_bgr.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    resized = cv2.resize(image_bgr, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - new_h) // 2, (imgsz - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = resized
+    return canvas
+
+
+def to_input_tensor(image_bgr: np.ndarray, imgsz: int) -> np.ndarray:
+    """BGR frame -> 1x3xHxW float32 RGB in [0, 1], as the exported model expects."""
+    rgb = letterbox(image_bgr, imgsz)[:, :, ::-1]
+    return np.ascontiguousarray(rgb.transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def limit_onnxruntime_threads(intra_op_threads: int = 1) -> None:
+    """
+    Cap ONNX Runtime's own thread pools for every session this process creates.
+    Ultralytics builds its InferenceSession without thread settings (and ORT
+    ignores OMP_NUM_THREADS), so each session would otherwise use every core.
+    Meant for worker processes that run one inference at a time.
+    """
+    import onnxruntime as ort
+
+    base = getattr(ort.InferenceSession, "_unlimited_base", ort.InferenceSession)
+
+    class LimitedInferenceSession(base):
+        _unlimited_base = base
+
+        def __init__(self, path_or_bytes, sess_options=None, *args, **kwargs):
+            sess_options = sess_options or ort.SessionOptions()
+            sess_options.intra_op_num_threads = intra_op_threads
+            sess_options.inter_op_num_threads = 1
+            super().__init__(path_or_bytes, sess_options, *args, **kwargs)
+
+    ort.InferenceSession = LimitedInferenceSession
+
+
 class YoloOnnxDetector:
-    """Lazy-loaded YOLO ONNX detector with optional one-time export fallback."""
+    """
+    Lazy-loaded YOLO ONNX detector with optional one-time export fallback.
+    Keeps one static-shape export per input resolution and tracks recent
+    latency per resolution so callers can pick a size by latency budget.
+    Measurements older than latency_max_age_s are dropped, so a size that
+    was slow once is estimated again from the sizes still in use.
+    """
 
-    def __init__(self, model_path: str = "models/yolo11n.onnx", source_weights: str = "yolo11n.pt") -> None:
+    def __init__(
+        self,
+        model_path: str = "models/yolo11n.onnx",
+        source_weights: str = "yolo11n.pt",
+        imgsz_options: Sequence[int] = (DEFAULT_IMGSZ,),
+        latency_window: int = 20,
+        latency_max_age_s: float = 30.0,
+        precision: str = "fp32",
+        calibration_dir: Optional[str] = None,
+        calibration_limit: int = 200,
+    ) -> None:
+        if precision not in PRECISIONS:
+            raise ValueError(f"precision must be one of {PRECISIONS}")
         self.model_path = Path(model_path)
         self.source_weights = source_weights
-        self._model = None
+        self.precision = precision
+        self.calibration_dir = Path(calibration_dir) if calibration_dir else None
+        self.calibration_limit = calibration_limit
+        self.imgsz_options: Tuple[int, ...] = tuple(sorted({int(size) for size in imgsz_options}))
+        if not self.imgsz_options or any(size <= 0 or size % 32 for size in self.imgsz_options):
+            raise ValueError("imgsz_options must be positive multiples of 32")
+        self.default_imgsz = DEFAULT_IMGSZ if DEFAULT_IMGSZ in self.imgsz_options else self.imgsz_options[-1]
+        self.latency_max_age_s = latency_max_age_s
+        self.clock = time.monotonic
+        self._models: Dict[int, Any] = {}
+        # (timestamp, latency ms) per size
+        self._latencies: Dict[int, Deque[Tuple[float, float]]] = {
+            size: deque(maxlen=latency_window) for size in self.imgsz_options
+        }
+        self._failed_sizes: Set[int] = set()
         self._lock = Lock()
 
     def warmup(self) -> None:
-        self._ensure_model_loaded()
+        """Load the default resolution; the others load (or are skipped) on first use."""
+        self._ensure_model_loaded(self.default_imgsz)
+
+    @property
+    def engine_name(self) -> str:
+        return "yolo-onnx" if self.precision == "fp32" else f"yolo-onnx-{self.precision}"
+
+    def model_path_for(self, imgsz: int, precision: Optional[str] = None) -> Path:
+        # The default resolution keeps the historical file name
+        path = self.model_path
+        if imgsz != DEFAULT_IMGSZ:
+            path = path.with_name(f"{path.stem}-{imgsz}{path.suffix}")
+        if (precision or self.precision) == "int8":
+            path = path.with_name(f"{path.stem}-int8{path.suffix}")
+        return path
 
-    def _export_onnx_if_missing(self) -> None:
-        if self.model_path.exists():
+    def _export_onnx_if_missing(self, imgsz: int) -> None:
+        model_path = self.model_path_for(imgsz, "fp32")
+        if model_path.exists():
             return
 
-        self.model_path.parent.mkdir(parents=True, exist_ok=True)
+        model_path.parent.mkdir(parents=True, exist_ok=True)
 
         # Import is local to avoid startup cost if accurate mode is never used.
         from ultralytics import YOLO
@@ -39,48 +139,207 @@ class YoloOnnxDetector:
         exported = Path(
             exporter.export(
                 format="onnx",
-                imgsz=640,
+                imgsz=imgsz,
                 simplify=True,
             )
         )
 
-        if exported.resolve() != self.model_path.resolve():
-            shutil.copy2(exported, self.model_path)
+        if exported.resolve() != model_path.resolve():
+            shutil.copy2(exported, model_path)
+
+    def _calibration_images(self, calibration_dir: Path) -> List[Path]:
+        images = sorted(
+            path for path in calibration_dir.rglob("*")
+            if path.suffix.lower() in CALIBRATION_EXTENSIONS
+        )
+        if not images:
+            raise ValueError(f"No calibration images found in {calibration_dir}")
+        return images[:self.calibration_limit]
+
+    def quantize_int8(self, imgsz: int = DEFAULT_IMGSZ, calibration_dir: Optional[str] = None) -> Path:
+        """
+        Write the INT8 variant of one resolution next to its FP32 export.
+        With calibration images this is static QDQ quantization (activations
+        calibrated offline); without, dynamic quantization of the weights.
+        """
+        import cv2
+        import onnx
+        from onnxruntime.quantization import (
+            CalibrationDataReader,
+            QuantFormat,
+            QuantType,
+            quantize_dynamic,
+            quantize_static,
+        )
+
+        self._export_onnx_if_missing(imgsz)
+        fp32_path = self.model_path_for(imgsz, "fp32")
+        int8_path = self.model_path_for(imgsz, "int8")
+        tmp_path = int8_path.with_name(f".{int8_path.stem}.{os.getpid()}.tmp{int8_path.suffix}")
+
+        source_dir = Path(calibration_dir) if calibration_dir else self.calibration_dir
+        fp32_model = onnx.load(str(fp32_path))
+
+        if source_dir:
+            input_name = fp32_model.graph.input[0].name
+            images = self._calibration_images(source_dir)
+
+            class FolderReader(CalibrationDataReader):
+                def __init__(self) -> None:
+                    self._iter = iter(images)
+
+                def get_next(self):
+                    for path in self._iter:
+                        frame = cv2.imread(str(path), cv2.IMREAD_COLOR)
+                        if frame is not None:
+                            return {input_name: to_input_tensor(frame, imgsz)}
+                    return None
 
-    def _ensure_model_loaded(self) -> None:
-        if self._model is not None:
+                def rewind(self) -> None:
+                    self._iter = iter(images)
+
+            quantize_static(
+                str(fp32_path),
+                str(tmp_path),
+                FolderReader(),
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+                per_channel=True,
+            )
+        else:
+            quantize_dynamic(str(fp32_path), str(tmp_path), weight_type=QuantType.QUInt8)
+
+        # Ultralytics reads class names, stride and imgsz from the model metadata
+        quantized = onnx.load(str(tmp_path))
+        del quantized.metadata_props[:]
+        quantized.metadata_props.extend(fp32_model.metadata_props)
+        onnx.save(quantized, str(tmp_path))
+        os.replace(tmp_path, int8_path)
+        return int8_path
+
+    def prepare_model(self, imgsz: int = DEFAULT_IMGSZ) -> Path:
+        """Export (and quantize) the model file for one resolution without loading it."""
+        if self.precision == "int8":
+            if not self.model_path_for(imgsz).exists():
+                self.quantize_int8(imgsz)
+        else:
+            self._export_onnx_if_missing(imgsz)
+        return self.model_path_for(imgsz)
+
+    def _ensure_model_loaded(self, imgsz: int = DEFAULT_IMGSZ) -> None:
+        if imgsz in self._models:
             return
 
         with self._lock:
-            if self._model is not None:
+            if imgsz in self._models:
                 return
 
-            self._export_onnx_if_missing()
+            self.prepare_model(imgsz)
 
             from ultralytics import YOLO
 
-            self._model = YOLO(str(self.model_path))
+            model = YOLO(str(self.model_path_for(imgsz)), task="detect")
+            # The first predict creates the ONNX Runtime session; keep that out of
+            # the latencies the size chooser works from
+            model.predict(
+                source=np.zeros((imgsz, imgsz, 3), dtype=np.uint8),
+                imgsz=imgsz,
+                device="cpu",
+                verbose=False,
+            )
+            self._models[imgsz] = model
+
+    def ensure_imgsz(self, imgsz: int) -> int:
+        """
+        Load one resolution and return it; a non-default size that fails to load
+        (e.g. its export cannot run) is skipped from then on in favour of the default.
+        """
+        if imgsz != self.default_imgsz and imgsz not in self._failed_sizes:
+            try:
+                self._ensure_model_loaded(imgsz)
+                return imgsz
+            except Exception as exc:
+                print(f"⚠️ YOLO imgsz {imgsz} unavailable, using {self.default_imgsz}: {exc}")
+                self._failed_sizes.add(imgsz)
+        try:
+            self._ensure_model_loaded(self.default_imgsz)
+        except Exception as exc:
+            raise RuntimeError(
+                "YOLO ONNX model is unavailable. Ensure ultralytics and onnxruntime are installed, and model export can run."
+            ) from exc
+        return self.default_imgsz
+
+    @property
+    def available_imgsz(self) -> Tuple[int, ...]:
+        return tuple(size for size in self.imgsz_options if size not in self._failed_sizes)
+
+    def record_latency(self, imgsz: int, latency_ms: float) -> None:
+        self._latencies[imgsz].append((self.clock(), latency_ms))
+
+    def _recent_latencies(self, imgsz: int) -> List[float]:
+        cutoff = self.clock() - self.latency_max_age_s
+        return [latency for recorded_at, latency in self._latencies[imgsz] if recorded_at >= cutoff]
+
+    def estimated_latency_ms(self, imgsz: int) -> Optional[float]:
+        """
+        Median of recent latencies at this size; for sizes with no recent
+        measurement, scale the nearest measured size by input area. None if
+        nothing was measured recently.
+        """
+        samples = self._recent_latencies(imgsz)
+        if samples:
+            return statistics.median(samples)
+
+        measured = {size: recent for size in self.imgsz_options if (recent := self._recent_latencies(size))}
+        if not measured:
+            return None
+        nearest = min(measured, key=lambda size: abs(size - imgsz))
+        return statistics.median(measured[nearest]) * (imgsz / nearest) ** 2
+
+    def select_imgsz(self, latency_budget_ms: float) -> int:
+        """Largest resolution whose estimated latency fits the budget (smallest if none do)."""
+        available = self.available_imgsz
+        fitting = [
+            size
+            for size in available
+            if (estimate := self.estimated_latency_ms(size)) is not None and estimate <= latency_budget_ms
+        ]
+        return max(fitting) if fitting else available[0]
+
+    def resolve_imgsz(self, imgsz: Optional[int] = None, latency_budget_ms: Optional[float] = None) -> int:
+        if imgsz is not None:
+            if imgsz not in self.imgsz_options:
+                raise ValueError(f"imgsz must be one of {list(self.imgsz_options)}")
+            return imgsz if imgsz not in self._failed_sizes else self.default_imgsz
+        if latency_budget_ms is not None:
+            return self.select_imgsz(latency_budget_ms)
+        return self.default_imgsz
+
+    def latency_profile(self) -> Dict[int, Optional[float]]:
+        """Estimated latency (ms) per usable resolution, as select_imgsz sees it"""
+        return {
+            size: round(estimate, 2) if (estimate := self.estimated_latency_ms(size)) is not None else None
+            for size in self.available_imgsz
+        }
 
     def detect(
         self,
         image_bgr: np.ndarray,
         confidence: float = 0.45,
         max_results: int = 12,
+        imgsz: Optional[int] = None,
     ) -> Tuple[List[Dict], float]:
         if image_bgr is None or image_bgr.size == 0:
             raise ValueError("Input frame is empty")
 
-        try:
-            self._ensure_model_loaded()
-        except Exception as exc:
-            raise RuntimeError(
-                "YOLO ONNX model is unavailable. Ensure ultralytics and onnxruntime are installed, and model export can run."
-            ) from exc
+        imgsz = self.ensure_imgsz(self.resolve_imgsz(imgsz))
 
         start = time.perf_counter()
 
-        results = self._model.predict(
+        results = self._models[imgsz].predict(
             source=image_bgr,
+            imgsz=imgsz,
             conf=confidence,
             iou=0.45,
             max_det=max_results,
@@ -89,6 +348,7 @@ class YoloOnnxDetector:
         )
 
         latency_ms = (time.perf_counter() - start) * 1000
+        self.record_latency(imgsz, latency_ms)
 
         if not results:
             return [], latency_ms